@@ -1,32 +1,52 @@
 """
 Flask Application Factory - IoC Pattern Implementation
 """
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify
 from flask_cors import CORS
-from dotenv import load_dotenv
-import os
 
-from .extensions import db, jwt, migrate
+from .extensions import db, jwt
 from .config import Config
 
 
 def create_app(config_class=Config):
     """
     Application factory pattern (IoC)
-    """
-    # Load environment variables
-    load_dotenv()
 
+    Kept free of I/O: environment variables are read once when config is
+    imported, and tables are only created when AUTO_CREATE_TABLES is set
+    (production schemas are managed with `flask db upgrade`).
+    """
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # ✅ DEBUG: confirm DB URL
-    print("✅ DB URL:", app.config.get("SQLALCHEMY_DATABASE_URI"))
+    # Behind a reverse proxy, remote_addr is the proxy: trust its forwarded headers
+    proxy_hops = app.config.get("PROXY_FIX_HOPS", 0)
+    if proxy_hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops, x_host=proxy_hops)
 
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
-    migrate.init_app(app, db)
+
+    from .utils.db import init_sqlite
+    init_sqlite(app)
+
+    # First request hooks, so requests stopped by later hooks are still timed
+    if app.config.get("METRICS_ENABLED"):
+        from .utils.metrics import init_metrics
+        init_metrics(app)
+    if app.config.get("QUERY_BUDGETS_ENABLED"):
+        from .utils.query_budget import init_query_budgets
+        init_query_budgets(app)
+    # Flask-Migrate is attached by the `flask db` command (see cli.py)
+
+    from .utils.rate_limit import limiter
+    limiter.init_app(app)
+
+    if app.config.get("DATABASE_REPLICA_BINDS"):
+        from .utils.db import init_replica_routing
+        init_replica_routing(app)
 
     # ---------------- JWT CONFIG ---------------- #
 
@@ -34,11 +54,25 @@ def create_app(config_class=Config):
     def user_identity_lookup(user_id):
         return user_id
 
-    @jwt.user_lookup_loader
-    def user_lookup_callback(_jwt_header, jwt_data):
-        from .models.user import User
-        identity = jwt_data["sub"]
-        return User.query.filter_by(id=identity).first()
+    # No user_lookup_loader: it would load the user on every verified
+    # request. Routes that need the row call get_current_user().
+
+    @jwt.token_in_blocklist_loader
+    def token_revoked_callback(_jwt_header, jwt_data):
+        from .utils.revocation import revocation_list
+        return revocation_list.is_revoked(jwt_data)
+
+    # ---------------- ERROR HANDLERS ---------------- #
+
+    from .utils.passwords import PasswordHasherBusy
+    from .utils.db import WriteSlotBusy
+
+    @app.errorhandler(PasswordHasherBusy)
+    @app.errorhandler(WriteSlotBusy)
+    def server_busy(_error):
+        response = jsonify({'error': 'Server is busy, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
     # ---------------- CORS CONFIG ---------------- #
 
@@ -66,18 +100,23 @@ def create_app(config_class=Config):
     
 
     # ---------------- 🔥 IMPORT MODELS (CRITICAL) ---------------- #
-    # SQLAlchemy will NOT create tables if models are not imported
+    # SQLAlchemy will NOT create tables (and Alembic will not autogenerate
+    # them) if models are not imported
 
-    from .models.user import User
-    from .models.post import Post
-    from .models.comment import Comment
-    # add more models here if you have them
+    from . import models  # noqa: F401
 
     # ---------------- CREATE DATABASE TABLES ---------------- #
 
-    with app.app_context():
-        db.create_all()
-        print("✅ PostgreSQL tables created successfully")
+    # Development convenience only: costs a connection and a metadata
+    # check on every worker boot
+    if app.config.get("AUTO_CREATE_TABLES"):
+        with app.app_context():
+            db.create_all()
+
+    # ---------------- CLI COMMANDS ---------------- #
+
+    from .cli import register_commands
+    register_commands(app)
 
     # ---------------- ROUTES ---------------- #
 
@@ -97,9 +136,49 @@ def create_app(config_class=Config):
     def health_check():
         return {"status": "healthy", "message": "Blog API is running"}
 
+    from .utils.jwt_utils import admin_required
+
+    @app.route("/api/health/pool")
+    @admin_required
+    def pool_health():
+        # Reveals database topology and load: admins only
+        from .utils.db import all_pool_stats
+        return all_pool_stats()
+
+    if app.config.get("METRICS_ENABLED"):
+        @app.route("/api/metrics")
+        def prometheus_metrics():
+            from .utils.metrics import metrics, CONTENT_TYPE, scrape_allowed
+            if not scrape_allowed():
+                return jsonify({"error": "Not found"}), 404
+            return metrics.render(app.config.get("METRICS_DIR")), 200, {"Content-Type": CONTENT_TYPE}
+
     @app.route("/uploads/<path:filename>")
     def serve_uploads(filename):
-        upload_folder = app.config.get("UPLOAD_FOLDER", "uploads")
-        return send_from_directory(upload_folder, filename)
+        from .utils import send_upload
+        return send_upload(filename)
+
+    @app.route("/uploads/<int:width>x<int:height>/<path:filename>")
+    def serve_thumbnail(width, height, filename):
+        from PIL import UnidentifiedImageError
+        from .utils import send_upload, thumbnail_cache, find_upload
+        from .utils.images import ImageTooLarge
+        if not thumbnail_cache.is_allowed(width, height):
+            return jsonify({"error": "Thumbnail size not allowed"}), 404
+
+        _, _, is_final = find_upload(filename)
+        if not is_final:
+            # Still processing: serve the raw upload uncached for now
+            return send_upload(filename)
+
+        try:
+            thumbnail = thumbnail_cache.get(filename, width, height)
+        except UnidentifiedImageError:
+            return jsonify({"error": "Not found"}), 404
+        except ImageTooLarge:
+            return jsonify({"error": "Image too large"}), 413
+        if thumbnail is None:
+            return jsonify({"error": "Not found"}), 404
+        return send_upload(thumbnail)
 
     return app
@@ -0,0 +1,213 @@
+"""
+CLI Commands - Maintenance commands registered on the Flask CLI
+"""
+import click
+from flask.cli import AppGroup, with_appcontext
+
+
+users_cli = AppGroup('users', help='User management commands.')
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Record format (guessed from the file extension by default).')
+@click.option('--chunk-size', type=int, default=None, help='Users per transaction.')
+def import_users(path, fmt, chunk_size):
+    """Provision users from a CSV or NDJSON file ('-' reads stdin)."""
+    from .services import auth_service
+    from .utils.bulk_import import detect_format, iter_records
+
+    fmt = fmt or detect_format(filename=path)
+    if not fmt:
+        raise click.UsageError('Cannot guess the format, pass --format csv or --format ndjson')
+
+    with click.open_file(path, 'rb') as stream:
+        report = auth_service.bulk_register_users(iter_records(stream, fmt), chunk_size)
+
+    for error in report['errors']:
+        click.echo(f"row {error['row']}: {error['error']}", err=True)
+    click.echo(f"Created {report['created']} users, {report['failed']} failed")
+    if report.get('stopped'):
+        raise click.ClickException(
+            f"{report['stopped']}: {report['not_processed']} rows not processed, "
+            f"resume from row {report['resume_from_row']}"
+        )
+
+
+@click.command('gc-uploads')
+@click.option('--grace-hours', type=float, default=24, show_default=True,
+              help='Keep unreferenced files younger than this.')
+@click.option('--dry-run', is_flag=True, help='Report what would be collected without touching files.')
+@click.option('--quarantine', type=click.Path(file_okay=False),
+              help='Move orphans into this directory instead of deleting them.')
+@click.option('--verbose', '-v', is_flag=True, help='List every collected file.')
+@with_appcontext
+def gc_uploads(grace_hours, dry_run, quarantine, verbose):
+    """Remove uploaded files that no post references."""
+    from .utils.upload_gc import collect_uploads
+
+    report = collect_uploads(grace_hours * 3600, dry_run=dry_run, quarantine_dir=quarantine)
+
+    if verbose:
+        for path in report['paths']:
+            click.echo(path)
+    action = 'Would reclaim' if dry_run else ('Quarantined' if quarantine else 'Reclaimed')
+    click.echo(f"{action} {report['bytes']} bytes in {report['files']} files")
+
+
+@click.command('recover-uploads')
+@click.option('--stale-minutes', type=float, default=10, show_default=True,
+              help='Leave processing jobs younger than this to the running workers.')
+@click.option('--verbose', '-v', is_flag=True, help='List every recovered image.')
+@with_appcontext
+def recover_uploads(stale_minutes, verbose):
+    """Finish image uploads whose processing job was lost."""
+    from .services import post_service
+
+    report = post_service.recover_uploads(stale_minutes * 60)
+
+    if verbose:
+        for url in report['urls']:
+            click.echo(url)
+    click.echo(f"Processed {report['processed']} images, {report['failed']} failed, "
+               f"removed {report['removed_parts']} partial uploads")
+
+
+@click.command('query-budgets')
+@click.argument('paths', nargs=-1)
+@click.option('--token', help='Access token sent with every request, to check authenticated routes.')
+@click.option('--verbose', '-v', is_flag=True, help='List the statements of every request.')
+@with_appcontext
+def query_budgets(paths, token, verbose):
+    """
+    Check SQL statement counts of GET routes against their budgets.
+
+    Runs against the configured database, which should hold a seeded
+    dataset. Without PATHS every budgeted route without URL arguments is
+    requested; pass concrete paths (e.g. /api/posts/some-slug) for the others.
+    """
+    from flask import current_app
+    from .utils.query_budget import budgeted_paths, check_budgets
+
+    app = current_app._get_current_object()
+    headers = {'Authorization': f'Bearer {token}'} if token else None
+    over_budget = 0
+    for path, status, budget, queries in check_budgets(app, paths or budgeted_paths(app), headers):
+        if queries.exceeded:
+            over_budget += 1
+            mark = 'OVER'
+        elif budget is None or status >= 400:
+            mark = '--'
+        else:
+            mark = 'ok'
+        click.echo(f"{mark:4} {path} [{status}] {queries.count} queries, budget {budget if budget is not None else 'none'}")
+        if verbose or queries.exceeded:
+            for statement in queries.statements:
+                click.echo(f"       {' '.join(statement.split())}")
+        if queries.exceeded:
+            click.echo(queries.offending_stack)
+
+    if over_budget:
+        raise click.ClickException(f'{over_budget} route(s) over their query budget')
+
+
+@click.command('generate-data')
+@click.option('--posts', type=int, default=10_000, show_default=True, help='Posts to generate.')
+@click.option('--users', type=int, help='Users to generate (default posts / 20).')
+@click.option('--tags', type=int, help='Tags to generate (default sqrt(posts)).')
+@click.option('--comments-per-post', type=float, default=5.0, show_default=True,
+              help='Mean comments of an ordinary published post.')
+@click.option('--tag-exponent', type=float, default=1.1, show_default=True,
+              help='Zipf exponent of tag popularity.')
+@click.option('--burst-ratio', type=float, default=0.02, show_default=True,
+              help='Share of posts drawing a burst of comments.')
+@click.option('--burst-size', type=float, default=20, show_default=True,
+              help='How many times more comments a bursting post gets.')
+@click.option('--seed', type=int, default=42, show_default=True, help='The same seed produces the same rows.')
+@click.option('--workers', type=int, help='Text generation processes (default CPU count, 0 runs inline).')
+@click.option('--password', required=True, help='Password of every generated user.')
+@click.option('--admin-email', default='admin@example.com', show_default=True, help='Email of user 1, an admin.')
+@click.option('--reset', is_flag=True,
+              help='Drop and recreate all tables first (debug mode or testing config only).')
+@click.option('--yes', is_flag=True, help='Do not ask before --reset drops the tables.')
+@with_appcontext
+def generate_data(posts, users, tags, comments_per_post, tag_exponent, burst_ratio, burst_size,
+                  seed, workers, password, admin_email, reset, yes):
+    """
+    Fill an empty database with a large synthetic dataset.
+
+    PostgreSQL (psycopg2) is loaded with COPY, other databases with batched
+    inserts. Generated users share one cheap password hash, upgraded to
+    the configured method on their first login; the admin gets a real one.
+    """
+    import time
+    from flask import current_app
+    from werkzeug.security import generate_password_hash
+    from .extensions import db
+    from .models import User
+    from .utils.datagen import dataset_spec, generate_data as generate
+    from .utils.passwords import password_hasher
+
+    if reset:
+        if not (current_app.debug or current_app.testing):
+            raise click.ClickException('--reset only runs in debug mode (FLASK_DEBUG=1) or with a testing config')
+        if not yes:
+            click.confirm(f'Drop every table of {db.engine.url.render_as_string()}?', abort=True)
+        db.drop_all()
+        db.create_all()
+    elif db.session.query(User.id).first() is not None:
+        raise click.ClickException('The database already has users, pass --reset to recreate the tables')
+    db.session.remove()
+
+    spec = dataset_spec(posts, users, tags, comments_per_post, seed, tag_exponent=tag_exponent,
+                        burst_ratio=burst_ratio, burst_size=burst_size,
+                        admin_email=admin_email, admin_username='admin')
+    password_hashes = (password_hasher.hash(password), generate_password_hash(password, 'pbkdf2:sha256:1000'))
+    started = time.perf_counter()
+
+    def progress(totals, done, total):
+        if done == total or done % max(1, total // 20) == 0:
+            rows = ', '.join(f'{count} {table}' for table, count in totals.items() if count)
+            click.echo(f'[{done}/{total}] {rows} ({time.perf_counter() - started:.0f}s)')
+
+    totals = generate(db.engine, db.metadata, spec, password_hashes, workers, progress)
+    click.echo(f"Generated {sum(totals.values())} rows in {time.perf_counter() - started:.1f}s; "
+               f"admin login {admin_email} with --password")
+
+
+class LazyMigrateGroup(click.Group):
+    """
+    The `flask db` group of Flask-Migrate, imported on first use.
+
+    Flask-Migrate imports Alembic, a noticeable share of startup time that
+    app servers never need.
+    """
+
+    def __init__(self, app):
+        super().__init__('db', help='Perform database migrations.')
+        self.app = app
+
+    def _load(self):
+        if 'migrate' not in self.app.extensions:
+            from flask_migrate import Migrate
+            from .extensions import db
+            Migrate(self.app, db)
+        from flask_migrate.cli import db as db_cli
+        return db_cli
+
+    def list_commands(self, ctx):
+        return self._load().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._load().get_command(ctx, name)
+
+
+def register_commands(app):
+    """Attach the CLI command groups to an app"""
+    app.cli.add_command(users_cli)
+    app.cli.add_command(gc_uploads)
+    app.cli.add_command(recover_uploads)
+    app.cli.add_command(query_budgets)
+    app.cli.add_command(generate_data)
+    app.cli.add_command(LazyMigrateGroup(app))
@@ -8,6 +8,41 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _env_flag(name, default):
+    return os.getenv(name, default).lower() == 'true'
+
+
+def build_engine_options(database_url):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a database URL from DB_* environment variables.
+
+    Pool sizes are per worker process: total connections are up to
+    workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW). With DB_PGBOUNCER=true the
+    app keeps no pool of its own (pgbouncer pools) and skips startup
+    parameters that transaction pooling does not support.
+    """
+    if database_url.startswith('sqlite'):
+        return {}
+
+    pgbouncer = _env_flag('DB_PGBOUNCER', 'false')
+    if pgbouncer:
+        from sqlalchemy.pool import NullPool
+        options = {'poolclass': NullPool}
+    else:
+        options = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),  # seconds waiting for a connection
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),  # seconds before reconnecting
+            'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', 'true'),
+        }
+
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and database_url.startswith('postgres') and not pgbouncer:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
 class Config:
     """Base configuration class"""
     
@@ -17,16 +52,86 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///blog.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+    # Read replicas: comma-separated URLs, registered as binds replica_0, replica_1, ...
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {
+        f'replica_{i}': {'url': url, **build_engine_options(url)} for i, url in enumerate(DATABASE_REPLICA_URLS)
+    }
+    DATABASE_REPLICA_BINDS = list(SQLALCHEMY_BINDS)
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))  # primary-only reads after a write
+    DB_PUBLIC_READ_TIMEOUT_MS = int(os.getenv('DB_PUBLIC_READ_TIMEOUT_MS', 5000))  # per-request cap on public reads (PostgreSQL)
+    AUTO_CREATE_TABLES = _env_flag('AUTO_CREATE_TABLES', 'false')  # create_all() at startup; schema via `flask db upgrade`
+    # SQLite only: per-connection pragmas (see utils.db.init_sqlite)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # readers no longer block on the writer
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # fsync at checkpoints; safe with WAL
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # wait for the write lock before failing
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))  # page cache per connection
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes read through mmap, 0 disables
     
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))  # seconds, 0 disables the process-level user cache
+    TOKEN_REVOCATION_REFRESH = int(os.getenv('TOKEN_REVOCATION_REFRESH', 30))  # seconds between revocation list reloads
+    
+    # Password hashing (Werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))  # 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))  # queued jobs beyond busy workers
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', 5))  # seconds before 503
     
+    # Bulk user provisioning
+    BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', 500))
+
     # Upload
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    IMAGE_VARIANT_WIDTHS = [int(w) for w in os.getenv('IMAGE_VARIANT_WIDTHS', '320,640,960,1280,1920').split(',')]
+    IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))  # Decompression-bomb limit (width * height)
+    IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 2))  # 0 processes uploads inline
+    THUMBNAIL_SIZES = [tuple(int(n) for n in size.split('x')) for size in os.getenv('THUMBNAIL_SIZES', '150x150,400x300,600x315,1200x630').split(',')]
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    UPLOAD_SERVE_MODE = os.getenv('UPLOAD_SERVE_MODE', 'direct')  # direct, x-sendfile, x-accel-redirect
+    UPLOAD_ACCEL_PREFIX = os.getenv('UPLOAD_ACCEL_PREFIX', '/protected-uploads/')  # nginx internal location
+    UPLOAD_CACHE_MAX_AGE = int(os.getenv('UPLOAD_CACHE_MAX_AGE', 3600))  # seconds, for non-hashed filenames
+    UPLOAD_PENDING_HOURS = float(os.getenv('UPLOAD_PENDING_HOURS', 24))  # keep unreferenced uploads this long for saving
     
+    # Comment spam protection
+    COMMENT_DUPLICATE_WINDOW = int(os.getenv('COMMENT_DUPLICATE_WINDOW', 24 * 60 * 60))  # seconds
+    COMMENT_FINGERPRINT_CACHE_SIZE = int(os.getenv('COMMENT_FINGERPRINT_CACHE_SIZE', 10000))
+    COMMENT_EXACT_DUPLICATE_ACTION = os.getenv('COMMENT_EXACT_DUPLICATE_ACTION', 'reject')  # reject, flag, allow
+    COMMENT_NEAR_DUPLICATE_ACTION = os.getenv('COMMENT_NEAR_DUPLICATE_ACTION', 'flag')  # reject, flag, allow
+    COMMENT_DUPLICATE_MIN_LENGTH = int(os.getenv('COMMENT_DUPLICATE_MIN_LENGTH', 40))  # shorter texts only match the same author
+
+    # RSS
+    SITE_URL = os.getenv('SITE_URL', '')  # public origin for feed links (https://blog.example.com); empty: SERVER_NAME
+    RSS_CACHE_TTL = int(os.getenv('RSS_CACHE_TTL', 300))  # seconds a rendered feed is reused
+    RSS_FULL_MAX_ITEMS = int(os.getenv('RSS_FULL_MAX_ITEMS', 5000))  # cap on ?full=1&limit=
+    RSS_STREAM_BATCH_SIZE = int(os.getenv('RSS_STREAM_BATCH_SIZE', 100))  # rows fetched per cursor round trip
+
+    # Metrics (GET /api/metrics, Prometheus text format)
+    METRICS_ENABLED = _env_flag('METRICS_ENABLED', 'true')
+    METRICS_DIR = os.getenv('METRICS_DIR', '')  # shared by workers to aggregate; empty: this process only
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))  # seconds between snapshot writes
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # bearer token for /api/metrics; empty: loopback clients only
+
+    # Per-request SQL statement counting: X-Query-Count header and a warning
+    # when a route exceeds its @query_budget (development aid)
+    QUERY_BUDGETS_ENABLED = _env_flag('QUERY_BUDGETS_ENABLED', 'false')
+
+    # Reverse proxies in front of the app whose X-Forwarded-For/-Proto/-Host
+    # headers are trusted (1 behind nginx); rate limits key on the client IP
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', 0))
+
+    # Rate limiting (memory:// per worker, redis://host:6379/0 shared)
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMIT_LOGIN = os.getenv('RATELIMIT_LOGIN', '10/minute')
+    RATELIMIT_REGISTER = os.getenv('RATELIMIT_REGISTER', '5/hour')
+    RATELIMIT_COMMENT = os.getenv('RATELIMIT_COMMENT', '5/minute')
+
     # Admin
     ADMIN_REGISTRATION_CODE = os.getenv('ADMIN_REGISTRATION_CODE', 'APPROVED')
 
@@ -34,14 +139,47 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
+    QUERY_BUDGETS_ENABLED = _env_flag('QUERY_BUDGETS_ENABLED', 'true')
+    AUTO_CREATE_TABLES = _env_flag('AUTO_CREATE_TABLES', 'true')
 
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    AUTO_CREATE_TABLES = _env_flag('AUTO_CREATE_TABLES', 'false')  # Schema via `flask db upgrade`
 
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_BINDS = {}
+    DATABASE_REPLICA_BINDS = []
+    RATELIMIT_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    IMAGE_PROCESSING_WORKERS = 0
+    AUTO_CREATE_TABLES = True
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def config_from_env():
+    """
+    Config class named by FLASK_CONFIG (development, production or testing).
+
+    Defaults to DevelopmentConfig when FLASK_DEBUG is on and to
+    ProductionConfig otherwise, so app servers never create tables
+    unless asked to.
+    """
+    debug = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true')
+    name = os.getenv('FLASK_CONFIG', 'development' if debug else 'production').lower()
+    if name not in CONFIGS:
+        raise ValueError(f"Unknown FLASK_CONFIG '{name}', use one of: {', '.join(CONFIGS)}")
+    return CONFIGS[name]
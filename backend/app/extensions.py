@@ -1,12 +1,54 @@
 """
 Flask Extensions - Centralized extension management for IoC
 """
+import random
+from contextvars import ContextVar
+
+from flask import current_app, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_jwt_extended import JWTManager
-from flask_migrate import Migrate
+
+# True while a read_only service method runs (see utils.db.read_only)
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads from read_only service methods to a replica.
+
+    Everything else, including flushes, goes to the primary. Within a
+    request a single replica is used, and none once the request has
+    written, is authenticated or carries the read-your-writes cookie
+    (see utils.db).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and replica_reads.get():
+            replica = self._replica_engine()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self):
+        keys = current_app.config.get('DATABASE_REPLICA_BINDS')
+        if not keys:
+            return None
+
+        if not has_request_context():
+            return self._db.engines[random.choice(keys)]
+
+        if g.get('_db_wrote') or g.get('_db_sticky'):
+            return None
+        if '_replica_key' not in g:
+            g._replica_key = random.choice(keys)
+        return self._db.engines[g._replica_key]
+
 
 # Initialize extensions without app (IoC pattern)
 # These will be configured in the app factory
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
-migrate = Migrate()
+
+# Flask-Migrate is attached on first use of the `flask db` commands
+# (see cli.py), keeping Alembic out of app server startup
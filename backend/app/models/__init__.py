@@ -1,8 +1,9 @@
 """
 Database Models Package
 """
-from .user import User
+from .user import User, TokenRevocation
 from .post import Post, Tag, post_tags
-from .comment import Comment
+from .comment import Comment, CommentFingerprint
+from .upload import Upload
 
-__all__ = ['User', 'Post', 'Tag', 'Comment', 'post_tags']
+__all__ = ['User', 'TokenRevocation', 'Post', 'Tag', 'Comment', 'CommentFingerprint', 'Upload', 'post_tags']
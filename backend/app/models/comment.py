@@ -20,6 +20,9 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     moderated_at = db.Column(db.DateTime)
 
+    fingerprints = db.relationship('CommentFingerprint', backref='comment',
+                                   cascade='all, delete-orphan')
+
     def to_dict(self, include_email=False):
         """Convert comment to dictionary"""
         # Determine author name - use username if authenticated, guest_name if not
@@ -44,3 +47,22 @@ class Comment(db.Model):
     def __repr__(self):
         author_name = self.author.username if self.author_id else self.guest_name
         return f'<Comment by {author_name}>'
+
+
+class CommentFingerprint(db.Model):
+    """
+    Fingerprint key of a comment, used to detect duplicates.
+
+    Each comment stores one exact-content key and several near-duplicate
+    (MinHash band) keys, all looked up through the same index.
+    """
+
+    __tablename__ = 'comment_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=False, index=True)
+    key = db.Column(db.String(80), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<CommentFingerprint {self.key[:14]}>'
@@ -52,6 +52,7 @@ class Post(db.Model):
     content = db.Column(db.Text, nullable=False)
     excerpt = db.Column(db.String(500))
     featured_image = db.Column(db.String(255))
+    featured_image_meta = db.Column(db.JSON)  # Variant manifest of the featured image
     status = db.Column(db.String(20), default='draft')  # draft, published
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -72,19 +73,31 @@ class Post(db.Model):
         slug = re.sub(r'[-\s]+', '-', slug)
         return slug
     
-    def to_dict(self, include_content=True):
-        """Convert post to dictionary"""
+    def to_dict(self, include_content=True, comment_count=None):
+        """
+        Convert post to dictionary.
+
+        List views pass comment_count, counted for the whole page at once
+        (see PostService._list_dicts), instead of one query per post.
+        """
+        from ..utils.images import build_srcset
+
+        image_meta = self.featured_image_meta or {}
         data = {
             'id': self.id,
             'title': self.title,
             'slug': self.slug,
             'excerpt': self.excerpt,
             'featured_image': self.featured_image,
+            'featured_image_variants': image_meta.get('variants', []),
+            'featured_image_srcset': build_srcset(image_meta.get('variants')),
+            'featured_image_placeholder': self._image_placeholder(image_meta),
             'status': self.status,
             'author_id': self.author_id,
             'author': self.author.username if self.author else None,
             'tags': [tag.to_dict() for tag in self.tags],
-            'comment_count': self.comments.filter_by(status='approved').count(),
+            'comment_count': (self.comments.filter_by(status='approved').count()
+                              if comment_count is None else comment_count),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'published_at': self.published_at.isoformat() if self.published_at else None
@@ -93,5 +106,13 @@ class Post(db.Model):
             data['content'] = self.content
         return data
     
+    @staticmethod
+    def _image_placeholder(image_meta):
+        """Inline preview, dominant color and intrinsic size for layout before the image loads"""
+        placeholder = image_meta.get('placeholder')
+        if not placeholder:
+            return None
+        return {**placeholder, 'width': image_meta.get('width'), 'height': image_meta.get('height')}
+    
     def __repr__(self):
         return f'<Post {self.title}>'
@@ -0,0 +1,32 @@
+"""
+Upload Model - Reference-counted, content-addressed image uploads
+"""
+from datetime import datetime
+from ..extensions import db
+
+
+class Upload(db.Model):
+    """
+    A stored upload, named by the hash of its content.
+
+    ref_count tracks how many posts reference the image, as featured
+    image or inline in their content. The files are removed once the
+    last reference is released.
+
+    last_uploaded_at is a pending reference: every upload of the content,
+    including duplicates of a stored image, refreshes it, and the files
+    are kept for UPLOAD_PENDING_HOURS so the uploader can still save
+    them into a post.
+    """
+
+    __tablename__ = 'uploads'
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    url = db.Column(db.String(255), nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Upload {self.url} refs={self.ref_count}>'
@@ -2,7 +2,6 @@
 User Model - Admin users for the blog platform
 """
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from ..extensions import db
 
 
@@ -16,6 +15,7 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)  # Changed default to False
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -25,11 +25,18 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = generate_password_hash(password)
+        from ..utils.passwords import password_hasher
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verify password against hash"""
-        return check_password_hash(self.password_hash, password)
+        from ..utils.passwords import password_hasher
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured method or cost"""
+        from ..utils.passwords import password_hasher
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Convert user to dictionary (excluding password)"""
@@ -43,3 +50,22 @@ class User(db.Model):
     
     def __repr__(self):
         return f'<User {self.username}>'
+
+
+class TokenRevocation(db.Model):
+    """
+    Revocation watermark for a user's access tokens.
+
+    Tokens carrying an older version that were issued at or before
+    revoked_at are rejected. There is no foreign key so that entries
+    outlive deleted users.
+    """
+
+    __tablename__ = 'token_revocations'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    token_version = db.Column(db.Integer, nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<TokenRevocation user={self.user_id} version={self.token_version}>'
@@ -2,11 +2,13 @@
 Admin Routes - Protected endpoints for content management
 """
 
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 
 from ..services import post_service, comment_service, auth_service
-from ..utils import admin_required
+from ..utils import admin_required, get_current_admin, send_upload
+from ..utils.bulk_import import detect_format, iter_records
+from ..utils.query_budget import query_budget
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -15,14 +17,17 @@ admin_bp = Blueprint('admin', __name__)
 # ======================================================
 
 @admin_bp.route('/dashboard', methods=['GET'])
+@query_budget(8)
 @admin_required
 def admin_dashboard():
     posts_data = post_service.get_all_posts(page=1, per_page=1)
     pending_comments = comment_service.get_pending_count()
     users_data = auth_service.get_all_users(page=1, per_page=1)
 
-    admin_id = get_jwt_identity()
-    admin_user = auth_service.get_user_by_id(admin_id)
+    admin_user = get_current_admin()
+    if not admin_user:
+        # Deleted after the token was issued, before revocation reached this worker
+        return jsonify({'error': 'User not found'}), 401
 
     return jsonify({
         'user': admin_user.to_dict(),
@@ -39,6 +44,7 @@ def admin_dashboard():
 # ======================================================
 
 @admin_bp.route('/posts', methods=['GET'])
+@query_budget(5)
 @admin_required
 def admin_get_all_posts():
     page = request.args.get('page', 1, type=int)
@@ -50,6 +56,7 @@ def admin_get_all_posts():
 
 
 @admin_bp.route('/posts/<int:post_id>', methods=['GET'])
+@query_budget(5)
 @admin_required
 def admin_get_post(post_id):
     post = post_service.get_post_by_id(post_id)
@@ -112,6 +119,7 @@ def admin_delete_post(post_id):
 # ======================================================
 
 @admin_bp.route('/comments', methods=['GET'])
+@query_budget(3)
 @admin_required
 def admin_get_all_comments():
     page = request.args.get('page', 1, type=int)
@@ -185,6 +193,7 @@ def admin_delete_comment(comment_id):
 # ======================================================
 
 @admin_bp.route('/users', methods=['GET'])
+@query_budget(3)
 @admin_required
 def admin_get_all_users():
     page = request.args.get('page', 1, type=int)
@@ -193,6 +202,51 @@ def admin_get_all_users():
     return jsonify(auth_service.get_all_users(page, per_page)), 200
 
 
+@admin_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+def admin_bulk_create_users():
+    """
+    Provision regular users from a CSV or NDJSON body (or 'file' upload).
+
+    Each record needs email, username and password. The format comes from
+    ?format=csv|ndjson, the content type or the uploaded filename.
+    """
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+
+    fmt = request.args.get('format') or detect_format(
+        upload.content_type if upload else request.content_type,
+        upload.filename if upload else None
+    )
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+
+    report = auth_service.bulk_register_users(iter_records(stream, fmt))
+    if report.get('stopped'):
+        # Partial import: the body says which rows to send again
+        return jsonify(report), 503, {'Retry-After': '1'}
+    return jsonify(report), 200
+
+
+@admin_bp.route('/users/<int:user_id>/role', methods=['PUT'])
+@admin_required
+def admin_update_user_role(user_id):
+    data = request.get_json()
+
+    if not data or 'is_admin' not in data:
+        return jsonify({'error': 'is_admin is required'}), 400
+
+    if int(get_jwt_identity()) == user_id:
+        return jsonify({'error': 'Cannot change your own role'}), 400
+
+    user, error = auth_service.update_user_role(user_id, bool(data['is_admin']))
+
+    if error:
+        return jsonify({'error': error}), 400
+
+    return jsonify({'message': 'User role updated', 'user': user}), 200
+
+
 @admin_bp.route('/users/<int:user_id>', methods=['DELETE'])
 @admin_required
 def admin_delete_user(user_id):
@@ -215,5 +269,4 @@ def admin_delete_user(user_id):
 
 @admin_bp.route('/uploads/<path:filename>', methods=['GET'])
 def serve_upload(filename):
-    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-    return send_from_directory(upload_folder, filename)
+    return send_upload(filename)
@@ -2,7 +2,9 @@
 Authentication Routes - User and Admin registration and login
 """
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import auth_service
+from ..utils import rate_limit
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -10,6 +12,7 @@ auth_bp = Blueprint('auth', __name__)
 # ============ User Registration & Login ============
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('RATELIMIT_REGISTER')
 def register_user():
     """
     Register a new regular user.
@@ -47,6 +50,7 @@ def register_user():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('RATELIMIT_LOGIN')
 def login_user():
     """
     Login as user and receive JWT token.
@@ -82,6 +86,7 @@ def login_user():
 # ============ Admin Registration & Login ============
 
 @auth_bp.route('/admin/register', methods=['POST'])
+@rate_limit('RATELIMIT_REGISTER')
 def register_admin():
     """
     Register a new admin user with special admin code.
@@ -121,6 +126,7 @@ def register_admin():
 
 
 @auth_bp.route('/admin/login', methods=['POST'])
+@rate_limit('RATELIMIT_LOGIN')
 def login_admin():
     """
     Login as admin and receive JWT token.
@@ -152,3 +158,16 @@ def login_admin():
         **result
     }), 200
 
+
+# ============ Logout ============
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke all tokens issued to the current user"""
+    success, error = auth_service.logout_user(int(get_jwt_identity()))
+
+    if error:
+        return jsonify({'error': error}), 400
+
+    return jsonify({'message': 'Logged out successfully'}), 200
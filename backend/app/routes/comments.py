@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..services import comment_service
+from ..utils import rate_limit
+from ..utils.db import statement_timeout
+from ..utils.query_budget import query_budget
 
 # ✅ DEFINE BLUEPRINT FIRST
 comments_bp = Blueprint('comments', __name__)
@@ -8,12 +11,15 @@ comments_bp = Blueprint('comments', __name__)
 # ---------------- PUBLIC ROUTES ---------------- #
 
 @comments_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+@query_budget(2)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_comments(post_id):
     comments = comment_service.get_approved_comments(post_id)
     return jsonify({'comments': comments}), 200
 
 
 @comments_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
+@rate_limit('RATELIMIT_COMMENT')
 def create_comment(post_id):
     data = request.get_json()
 
@@ -44,6 +50,7 @@ def create_comment(post_id):
 # ---------------- USER ROUTES (🔥 YOUR MISSING PART) ---------------- #
 
 @comments_bp.route('/comments/my', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_my_comments():
     user_id = get_jwt_identity()
@@ -61,6 +68,7 @@ def get_my_comments():
 # ---------------- USER CREATE COMMENT ---------------- #
 
 @comments_bp.route('/user/posts/<int:post_id>/comments', methods=['POST'])
+@rate_limit('RATELIMIT_COMMENT', scope='user')
 @jwt_required()
 def create_user_comment(post_id):
     user_id = get_jwt_identity()
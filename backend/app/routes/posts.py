@@ -3,11 +3,15 @@ Public Posts Routes - Read-only endpoints for blog posts
 """
 from flask import Blueprint, request, jsonify
 from ..services import post_service
+from ..utils.db import statement_timeout
+from ..utils.query_budget import query_budget
 
 posts_bp = Blueprint('posts', __name__)
 
 
 @posts_bp.route('', methods=['GET'])
+@query_budget(5)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_posts():
     """
     Get published blog posts with pagination.
@@ -24,6 +28,8 @@ def get_posts():
 
 
 @posts_bp.route('/<slug>', methods=['GET'])
+@query_budget(5)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_post(slug):
     """Get a single published post by slug (or draft if author)"""
     from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
@@ -53,6 +59,8 @@ def get_post(slug):
 
 
 @posts_bp.route('/tags', methods=['GET'])
+@query_budget(3)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_tags():
     """Get all tags with post counts"""
     tags = post_service.get_all_tags()
@@ -60,6 +68,8 @@ def get_tags():
 
 
 @posts_bp.route('/tags/<tag_slug>', methods=['GET'])
+@query_budget(6)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_posts_by_tag(tag_slug):
     """
     Get published posts filtered by tag.
@@ -1,31 +1,113 @@
 """
-RSS Feed Route - Generate RSS feed for blog
+RSS Feed Route - Generate RSS, Atom and JSON feeds for blog
 """
-from flask import Blueprint, Response, request
+from flask import Blueprint, Response, request, current_app, jsonify, stream_with_context
 from ..services import rss_service
+from ..utils.db import statement_timeout
+from ..utils.query_budget import query_budget
+from ..utils.feeds import FEED_FORMATS, STREAMING_FEED_FORMATS
 
 rss_bp = Blueprint('rss', __name__)
 
 
-@rss_bp.route('/rss', methods=['GET'])
-def get_rss_feed():
+def _feed_response(tag=None, author=None):
+    """
+    Render a feed in the requested ?format= (rss, atom or json).
+
+    Supports If-None-Match / If-Modified-Since, answering unchanged
+    polls with 304. With ?full=1 the feed carries full post content and
+    is streamed (rss and atom only, up to RSS_FULL_MAX_ITEMS via ?limit=).
     """
-    Get RSS 2.0 feed for published blog posts.
+    fmt = request.args.get('format', 'rss')
+    if fmt not in FEED_FORMATS:
+        return jsonify({'error': f"Unknown feed format, use one of: {', '.join(FEED_FORMATS)}"}), 400
+
+    base_url = _site_url()
+    
+    if request.args.get('full', type=int):
+        return _streamed_feed_response(base_url, fmt, tag, author)
+    
+    feed = rss_service.get_feed(base_url=base_url, fmt=fmt, tag=tag, author=author)
+    if feed is None:
+        return jsonify({'error': 'Feed not found'}), 404
     
-    Returns XML content type.
+    body, etag, last_modified = feed
+    response = Response(body, mimetype=FEED_FORMATS[fmt][1])
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('RSS_CACHE_TTL', 300)
+    return response.make_conditional(request)
+
+
+def _site_url():
+    """
+    Public origin of the blog for feed links: SITE_URL, else SERVER_NAME.
+
+    Feeds are cached and shared by every client, so their links must not
+    follow the Host header; only development and tests fall back to it.
     """
-    # Get base URL from request or use default
-    base_url = request.host_url.rstrip('/')
+    site_url = current_app.config.get('SITE_URL')
+    if site_url:
+        return site_url.rstrip('/')
+    server_name = current_app.config.get('SERVER_NAME')
+    if server_name:
+        return f"{current_app.config.get('PREFERRED_URL_SCHEME', 'http')}://{server_name}"
+    if current_app.debug or current_app.testing:
+        return request.host_url.rstrip('/')
+    raise RuntimeError('Set SITE_URL (or SERVER_NAME) to serve feeds')
+
+
+def _streamed_feed_response(base_url, fmt, tag, author):
+    if fmt not in STREAMING_FEED_FORMATS:
+        return jsonify({'error': 'Full-content feeds are available as rss or atom'}), 400
+
+    max_items = current_app.config.get('RSS_FULL_MAX_ITEMS', 5000)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), max_items)
+    
+    chunks = rss_service.stream_feed(base_url=base_url, fmt=fmt, tag=tag, author=author, limit=limit)
+    if chunks is None:
+        return jsonify({'error': 'Feed not found'}), 404
     
-    feed_xml = rss_service.generate_feed(base_url=base_url)
+    return Response(stream_with_context(chunks), mimetype=FEED_FORMATS[fmt][1])
+
+
+@rss_bp.route('/rss', methods=['GET'])
+@query_budget(3)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
+def get_rss_feed():
+    """
+    Get feed of published blog posts.
     
-    return Response(feed_xml, mimetype='application/rss+xml')
+    Query params:
+    - format: rss (default, RSS 2.0), atom or json (JSON Feed 1.1)
+    - full: 1 for full post content, streamed (rss and atom)
+    - limit: Number of posts in a full feed (default: 20)
+    """
+    return _feed_response()
+
+
+@rss_bp.route('/rss/tags/<slug>', methods=['GET'])
+@query_budget(3)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
+def get_tag_feed(slug):
+    """Get feed of published posts with a tag (same formats as /rss)"""
+    return _feed_response(tag=slug)
+
+
+@rss_bp.route('/rss/authors/<username>', methods=['GET'])
+@query_budget(3)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
+def get_author_feed(username):
+    """Get feed of published posts by an author (same formats as /rss)"""
+    return _feed_response(author=username)
 
 
 @rss_bp.route('/rss/info', methods=['GET'])
+@query_budget(2)
+@statement_timeout('DB_PUBLIC_READ_TIMEOUT_MS')
 def get_rss_info():
     """Get information about the RSS feed"""
-    base_url = request.host_url.rstrip('/')
-    info = rss_service.get_feed_info(base_url=base_url)
+    info = rss_service.get_feed_info(base_url=_site_url())
     
     return info, 200
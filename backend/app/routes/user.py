@@ -4,7 +4,8 @@ User Routes - Protected endpoints for regular users to manage their own content
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from ..services import post_service, comment_service
-from ..utils import user_required, get_current_user
+from ..utils import user_required, get_current_user, rate_limit
+from ..utils.query_budget import query_budget
 
 user_bp = Blueprint('user', __name__)
 
@@ -12,11 +13,15 @@ user_bp = Blueprint('user', __name__)
 # ============ User Dashboard ============
 
 @user_bp.route('/dashboard', methods=['GET'])
+@query_budget(5)
 @user_required
 def get_dashboard():
     """Get user dashboard with their stats"""
     user_id = get_jwt_identity()
     user = get_current_user()
+    if not user:
+        # Deleted after the token was issued, before revocation reached this worker
+        return jsonify({'error': 'User not found'}), 401
 
     # Get user's post count
     from ..models import Post, Comment
@@ -24,7 +29,7 @@ def get_dashboard():
     user_comments = Comment.query.filter_by(author_id=user_id).count()
 
     return jsonify({
-        'user': user.to_dict() if user else None,
+        'user': user.to_dict(),
         'stats': {
             'total_posts': user_posts,
             'total_comments': user_comments
@@ -35,6 +40,7 @@ def get_dashboard():
 # ============ User Posts Management ============
 
 @user_bp.route('/posts', methods=['GET'])
+@query_budget(5)
 @user_required
 def get_user_posts():
     """Get all posts created by the current user"""
@@ -54,6 +60,7 @@ def get_user_posts():
 
 
 @user_bp.route('/posts/<int:post_id>', methods=['GET'])
+@query_budget(5)
 @user_required
 def get_user_post(post_id):
     """Get a specific post owned by the user"""
@@ -191,9 +198,30 @@ def upload_user_image():
     return jsonify(result), 200
 
 
+@user_bp.route('/posts/upload/status', methods=['GET'])
+@user_required
+def get_upload_status():
+    """
+    Get the processing status of an uploaded image.
+
+    Query params:
+    - image_url: URL returned by the upload endpoint
+    """
+    image_url = request.args.get('image_url')
+    if not image_url:
+        return jsonify({'error': 'image_url is required'}), 400
+
+    result = post_service.get_upload_status(image_url)
+    if not result:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    return jsonify(result), 200
+
+
 # ============ User Comments Management ============
 
 @user_bp.route('/comments', methods=['GET'])
+@query_budget(3)
 @user_required
 def get_user_comments():
     """Get all comments created by the current user"""
@@ -211,6 +239,7 @@ def get_user_comments():
 
 
 @user_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
+@rate_limit('RATELIMIT_COMMENT', scope='user')
 @user_required
 def create_user_comment(post_id):
     """
@@ -1,12 +1,33 @@
 """
 Authentication Service - Handle admin user registration and login
 """
-from ..models import User
+import re
+from datetime import datetime
+from sqlalchemy import or_
+from ..models import User, TokenRevocation
 from ..extensions import db
+from ..utils import (
+    invalidate_cached_user, token_claims, revocation_list, password_hasher, PasswordHasherBusy
+)
+from ..utils.db import write_transaction
 from flask_jwt_extended import create_access_token
 from flask import current_app
 
 
+EMAIL_PATTERN = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+
+def _registration_error(email, username, password):
+    """Why a registration's fields are unacceptable, or None"""
+    if not EMAIL_PATTERN.fullmatch(email) or len(email) > 120:
+        return 'Invalid email'
+    if len(username) > 80:
+        return 'Username must be at most 80 characters'
+    if len(password) < 6:
+        return 'Password must be at least 6 characters'
+    return None
+
+
 class AuthService:
     """
     Authentication service following IoC principle.
@@ -25,6 +46,10 @@ class AuthService:
         Returns:
             tuple: (user_dict, error_message)
         """
+        error = _registration_error(email, username, password)
+        if error:
+            return None, error
+
         # Check if email already exists
         if User.query.filter_by(email=email).first():
             return None, 'Email already registered'
@@ -33,10 +58,6 @@ class AuthService:
         if User.query.filter_by(username=username).first():
             return None, 'Username already taken'
 
-        # Validate password strength
-        if len(password) < 6:
-            return None, 'Password must be at least 6 characters'
-
         try:
             # Create new regular user
             user = User(
@@ -46,11 +67,17 @@ class AuthService:
             )
             user.set_password(password)
 
-            db.session.add(user)
-            db.session.commit()
+            # Hashed before taking the write slot
+            with write_transaction():
+                db.session.add(user)
+                db.session.commit()
 
             return user.to_dict(), None
 
+        except PasswordHasherBusy:
+            db.session.rollback()
+            raise
+
         except Exception as e:
             db.session.rollback()
             return None, f'Registration failed: {str(e)}'
@@ -76,6 +103,10 @@ class AuthService:
         if admin_code != required_code:
             return None, 'Invalid admin code'
 
+        error = _registration_error(email, username, password)
+        if error:
+            return None, error
+
         # Check if email already exists
         if User.query.filter_by(email=email).first():
             return None, 'Email already registered'
@@ -84,10 +115,6 @@ class AuthService:
         if User.query.filter_by(username=username).first():
             return None, 'Username already taken'
 
-        # Validate password strength
-        if len(password) < 6:
-            return None, 'Password must be at least 6 characters'
-
         try:
             # Create new admin user
             user = User(
@@ -97,11 +124,16 @@ class AuthService:
             )
             user.set_password(password)
 
-            db.session.add(user)
-            db.session.commit()
+            with write_transaction():
+                db.session.add(user)
+                db.session.commit()
 
             return user.to_dict(), None
 
+        except PasswordHasherBusy:
+            db.session.rollback()
+            raise
+
         except Exception as e:
             db.session.rollback()
             return None, f'Registration failed: {str(e)}'
@@ -131,8 +163,10 @@ class AuthService:
 
         print(f"DEBUG: Login successful for user: {user.username}")
 
-        # Create JWT token
-        access_token = create_access_token(identity=str(user.id))
+        self._upgrade_password_hash(user, password)
+
+        # Create JWT token carrying role and token version
+        access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
 
         return {
             'access_token': access_token,
@@ -168,14 +202,144 @@ class AuthService:
 
         print(f"DEBUG: Admin login successful for user: {user.username}")
 
-        # Create JWT token
-        access_token = create_access_token(identity=str(user.id))
+        self._upgrade_password_hash(user, password)
+
+        # Create JWT token carrying role and token version
+        access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
 
         return {
             'access_token': access_token,
             'user': user.to_dict()
         }, None
     
+    def bulk_register_users(self, records, chunk_size=None):
+        """
+        Provision many regular users from a stream of records.
+
+        Records are processed in chunks: one uniqueness query per chunk,
+        passwords hashed in parallel, and one transaction per chunk.
+
+        If the password hasher stays busy, the import stops before the
+        chunk it was hashing: earlier chunks are kept and the report says
+        where to resume. Rows of that chunk are all left unwritten.
+
+        Args:
+            records: Iterable of dicts with email, username and password
+            chunk_size: Records per transaction (default BULK_IMPORT_CHUNK_SIZE)
+
+        Returns:
+            dict: Counts and per-row errors (rows numbered from 1); rows
+            neither created nor failed count as not_processed. A stopped
+            import also has 'stopped' (the reason) and 'resume_from_row'.
+        """
+        chunk_size = chunk_size or current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 500)
+        report = {'created': 0, 'failed': 0, 'not_processed': 0, 'errors': []}
+
+        records = iter(records)
+        chunk = []
+        rows = 0
+        try:
+            for rows, record in enumerate(records, start=1):
+                chunk.append((rows, record))
+                if len(chunk) >= chunk_size:
+                    self._provision_chunk(chunk, report)
+                    chunk = []
+
+            if chunk:
+                self._provision_chunk(chunk, report)
+
+        except PasswordHasherBusy:
+            rows += sum(1 for _ in records)
+            report['not_processed'] = rows - report['created'] - report['failed']
+            report['stopped'] = 'Password hashing is busy'
+            report['resume_from_row'] = chunk[0][0]
+
+        return report
+
+    def _provision_chunk(self, chunk, report):
+        """Validate, hash and insert one chunk of user records"""
+        def fail(row_number, error):
+            report['failed'] += 1
+            report['errors'].append({'row': row_number, 'error': error})
+
+        valid = []
+        for row_number, record in chunk:
+            if '_error' in record:
+                fail(row_number, record['_error'])
+                continue
+
+            email = str(record.get('email') or '').strip()
+            username = str(record.get('username') or '').strip()
+            password = str(record.get('password') or '')
+
+            if not email or not username or not password:
+                error = 'email, username and password are required'
+            else:
+                error = _registration_error(email, username, password)
+
+            if error:
+                fail(row_number, error)
+            else:
+                valid.append((row_number, email, username, password))
+
+        if not valid:
+            return
+
+        # One query for the whole chunk instead of two per user
+        existing = db.session.query(User.email, User.username).filter(or_(
+            User.email.in_([row[1] for row in valid]),
+            User.username.in_([row[2] for row in valid])
+        )).all()
+        taken_emails = {email for email, _ in existing}
+        taken_usernames = {username for _, username in existing}
+
+        accepted = []
+        for row_number, email, username, password in valid:
+            if email in taken_emails:
+                fail(row_number, 'Email already registered')
+            elif username in taken_usernames:
+                fail(row_number, 'Username already taken')
+            else:
+                # Also rejects duplicates later in the same chunk
+                taken_emails.add(email)
+                taken_usernames.add(username)
+                accepted.append((row_number, email, username, password))
+
+        if not accepted:
+            return
+
+        hashes = password_hasher.hash_many(row[3] for row in accepted)
+        users = [
+            (row_number, User(email=email, username=username, password_hash=password_hash, is_admin=False))
+            for (row_number, email, username, _), password_hash in zip(accepted, hashes)
+        ]
+
+        with write_transaction():
+            try:
+                db.session.add_all(user for _, user in users)
+                db.session.commit()
+                report['created'] += len(users)
+                return
+            except Exception:
+                # A concurrent registration won a race; retry row by row to find it
+                db.session.rollback()
+
+            added = []
+            for row_number, user in users:
+                try:
+                    with db.session.begin_nested():
+                        db.session.add(user)
+                    added.append(row_number)
+                except Exception as e:
+                    fail(row_number, f'Registration failed: {e.__class__.__name__}')
+            try:
+                db.session.commit()
+                report['created'] += len(added)
+            except Exception as e:
+                db.session.rollback()
+                for row_number in added:
+                    fail(row_number, f'Registration failed: {e.__class__.__name__}')
+
     def get_user_by_id(self, user_id):
         """Get user by ID"""
         return User.query.get(user_id)
@@ -203,6 +367,7 @@ class AuthService:
             'per_page': per_page
         }
 
+    @write_transaction()
     def delete_user(self, user_id):
         """
         Delete a user (admin only).
@@ -219,9 +384,101 @@ class AuthService:
             return False, 'User not found'
 
         try:
+            revocation = self._revoke_tokens(user)
             db.session.delete(user)
             db.session.commit()
+            self._apply_revocation(revocation)
+            invalidate_cached_user(user_id)
             return True, None
         except Exception as e:
             db.session.rollback()
             return False, f'Failed to delete user: {str(e)}'
+
+    @write_transaction()
+    def update_user_role(self, user_id, is_admin):
+        """
+        Promote or demote a user (admin only).
+        Existing tokens carry the old role, so they are revoked.
+
+        Args:
+            user_id: ID of user to update
+            is_admin: New admin flag
+
+        Returns:
+            tuple: (user_dict, error_message)
+        """
+        user = User.query.get(user_id)
+
+        if not user:
+            return None, 'User not found'
+
+        if user.is_admin == is_admin:
+            return user.to_dict(), None
+
+        try:
+            user.is_admin = is_admin
+            revocation = self._revoke_tokens(user)
+            db.session.commit()
+            self._apply_revocation(revocation)
+            return user.to_dict(), None
+        except Exception as e:
+            db.session.rollback()
+            return None, f'Failed to update user role: {str(e)}'
+
+    @write_transaction()
+    def logout_user(self, user_id):
+        """
+        Revoke every token issued to a user so far.
+
+        Returns:
+            tuple: (success, error_message)
+        """
+        user = User.query.get(user_id)
+
+        if not user:
+            return False, 'User not found'
+
+        try:
+            revocation = self._revoke_tokens(user)
+            db.session.commit()
+            self._apply_revocation(revocation)
+            return True, None
+        except Exception as e:
+            db.session.rollback()
+            return False, f'Failed to log out: {str(e)}'
+
+    def _upgrade_password_hash(self, user, password):
+        """Re-hash a verified password when the configured method or cost changed"""
+        if not user.password_needs_rehash():
+            return
+
+        try:
+            with write_transaction():
+                user.set_password(password)
+                db.session.commit()
+        except PasswordHasherBusy:
+            # Not worth failing a valid login over; retried on the next one
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f'Password rehash failed for user {user.id}: {e}')
+
+    def _revoke_tokens(self, user):
+        """Bump the user's token version and upsert its revocation entry (not committed)"""
+        user.token_version = (user.token_version or 0) + 1
+        revoked_at = datetime.utcnow()
+
+        revocation = db.session.get(TokenRevocation, user.id)
+        if revocation:
+            revocation.token_version = user.token_version
+            revocation.revoked_at = revoked_at
+        else:
+            revocation = TokenRevocation(user_id=user.id, token_version=user.token_version,
+                                         revoked_at=revoked_at)
+            db.session.add(revocation)
+
+        return user.id, user.token_version, revoked_at
+
+    def _apply_revocation(self, revocation):
+        """Make a committed revocation effective in this process immediately"""
+        revocation_list.record(*revocation)
@@ -1,9 +1,13 @@
 """
 Comment Service - Guest, User commenting with Admin moderation
 """
-from datetime import datetime
-from ..models import Comment, Post
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from ..models import Comment, CommentFingerprint, Post
 from ..extensions import db
+from ..utils.fingerprint import RecentFingerprintWindow, classify_match, fingerprint
+from ..utils.db import read_only, write_transaction
 
 
 class CommentService:
@@ -12,19 +16,24 @@ class CommentService:
     Handles guest comments, user comments, and admin moderation.
     """
 
+    def __init__(self):
+        self._recent_fingerprints = None
+
     # ======================================================
     # PUBLIC (GUEST)
     # ======================================================
 
+    @read_only
     def get_approved_comments(self, post_id):
         """Get approved comments for a post (public view)"""
-        comments = Comment.query.filter_by(
+        comments = Comment.query.options(joinedload(Comment.author)).filter_by(
             post_id=post_id,
             status='approved'
         ).order_by(Comment.created_at.desc()).all()
 
         return [comment.to_dict() for comment in comments]
 
+    @write_transaction()
     def create_comment(self, post_id, guest_name, guest_email, content):
         """
         Create a new guest comment.
@@ -47,16 +56,23 @@ class CommentService:
             if not content or len(content.strip()) < 5:
                 return None, 'Comment must be at least 5 characters'
 
+            fp = self._fingerprint(content, guest_email=guest_email)
+            status, error = self._screen_duplicate(fp, 'pending')
+            if error:
+                return None, error
+
             comment = Comment(
                 post_id=post_id,
                 guest_name=guest_name.strip(),
                 guest_email=guest_email.strip().lower(),
                 content=content.strip(),
-                status='pending'
+                status=status
             )
+            comment.fingerprints = self._build_fingerprints(fp)
 
             db.session.add(comment)
             db.session.commit()
+            self._get_recent_fingerprints().add(comment.id, fp)
 
             return comment.to_dict(), None
 
@@ -68,6 +84,7 @@ class CommentService:
     # USER (AUTHENTICATED)
     # ======================================================
 
+    @write_transaction()
     def create_user_comment(self, post_id, user_id, content):
         """
         Create a new comment by an authenticated user.
@@ -84,15 +101,22 @@ class CommentService:
             if not content or len(content.strip()) < 5:
                 return None, 'Comment must be at least 5 characters'
 
+            fp = self._fingerprint(content, user_id=user_id)
+            status, error = self._screen_duplicate(fp, 'approved')
+            if error:
+                return None, error
+
             comment = Comment(
                 post_id=post_id,
                 author_id=user_id,
                 content=content.strip(),
-                status='approved'
+                status=status
             )
+            comment.fingerprints = self._build_fingerprints(fp)
 
             db.session.add(comment)
             db.session.commit()
+            self._get_recent_fingerprints().add(comment.id, fp)
 
             return comment.to_dict(), None
 
@@ -102,7 +126,7 @@ class CommentService:
 
     def get_user_comments(self, user_id, page=1, per_page=20):
         """Get all comments created by a specific user"""
-        pagination = Comment.query.filter_by(author_id=user_id) \
+        pagination = Comment.query.options(joinedload(Comment.author)).filter_by(author_id=user_id) \
             .order_by(Comment.created_at.desc()) \
             .paginate(page=page, per_page=per_page, error_out=False)
 
@@ -115,6 +139,7 @@ class CommentService:
             'has_prev': pagination.has_prev
         }
 
+    @write_transaction()
     def update_user_comment(self, comment_id, user_id, content):
         """Update a comment owned by the user"""
         try:
@@ -128,16 +153,27 @@ class CommentService:
             if not content or len(content.strip()) < 5:
                 return None, 'Comment must be at least 5 characters'
 
+            # Edits are screened like new comments, so innocuous text
+            # cannot be swapped for a duplicate afterwards
+            fp = self._fingerprint(content, user_id=comment.author_id)
+            status, error = self._screen_duplicate(fp, comment.status, exclude_comment_id=comment.id)
+            if error:
+                return None, error
+
             comment.content = content.strip()
+            comment.status = status
             comment.updated_at = datetime.utcnow()
+            comment.fingerprints = self._build_fingerprints(fp)
 
             db.session.commit()
+            self._get_recent_fingerprints().add(comment.id, fp)
             return comment.to_dict(), None
 
         except Exception as e:
             db.session.rollback()
             return None, f'Failed to update comment: {str(e)}'
 
+    @write_transaction()
     def delete_user_comment(self, comment_id, user_id):
         """Delete a comment owned by the user"""
         try:
@@ -150,6 +186,7 @@ class CommentService:
 
             db.session.delete(comment)
             db.session.commit()
+            self._get_recent_fingerprints().discard(comment_id)
             return True, None
 
         except Exception as e:
@@ -162,7 +199,7 @@ class CommentService:
 
     def get_all_comments(self, page=1, per_page=20, status=None):
         """Get all comments (admin view)"""
-        query = Comment.query.order_by(Comment.created_at.desc())
+        query = Comment.query.options(joinedload(Comment.author)).order_by(Comment.created_at.desc())
 
         if status:
             query = query.filter_by(status=status)
@@ -182,6 +219,7 @@ class CommentService:
         """Get count of pending comments"""
         return Comment.query.filter_by(status='pending').count()
 
+    @write_transaction()
     def moderate_comment(self, comment_id, action):
         """Approve or reject a comment"""
         try:
@@ -202,6 +240,7 @@ class CommentService:
             db.session.rollback()
             return None, f'Failed to moderate comment: {str(e)}'
 
+    @write_transaction()
     def admin_update_comment(self, comment_id, content):
         """Admin can update any comment (guest or user)"""
         try:
@@ -212,16 +251,22 @@ class CommentService:
             if not content or len(content.strip()) < 5:
                 return None, 'Comment must be at least 5 characters'
 
+            # Not screened (admins edit on purpose), but later comments
+            # are compared against the new text
+            fp = self._fingerprint(content, user_id=comment.author_id, guest_email=comment.guest_email)
             comment.content = content.strip()
             comment.updated_at = datetime.utcnow()
+            comment.fingerprints = self._build_fingerprints(fp)
 
             db.session.commit()
+            self._get_recent_fingerprints().add(comment.id, fp)
             return comment.to_dict(include_email=True), None
 
         except Exception as e:
             db.session.rollback()
             return None, f'Failed to update comment: {str(e)}'
 
+    @write_transaction()
     def delete_comment(self, comment_id):
         """Admin delete any comment"""
         try:
@@ -231,8 +276,84 @@ class CommentService:
 
             db.session.delete(comment)
             db.session.commit()
+            self._get_recent_fingerprints().discard(comment_id)
             return True, None
 
         except Exception as e:
             db.session.rollback()
             return False, f'Failed to delete comment: {str(e)}'
+
+    # ======================================================
+    # DUPLICATE DETECTION
+    # ======================================================
+
+    def _get_recent_fingerprints(self):
+        """Lazily build the in-memory window from app config"""
+        if self._recent_fingerprints is None:
+            self._recent_fingerprints = RecentFingerprintWindow(
+                max_size=current_app.config.get('COMMENT_FINGERPRINT_CACHE_SIZE', 10000),
+                ttl=current_app.config.get('COMMENT_DUPLICATE_WINDOW', 24 * 60 * 60)
+            )
+        return self._recent_fingerprints
+
+    def _fingerprint(self, content, user_id=None, guest_email=None):
+        """Fingerprint content, keyed per author: the user id, else the guest email"""
+        if user_id is not None:
+            author = f'user:{user_id}'
+        else:
+            author = f"guest:{(guest_email or '').strip().lower()}"
+        return fingerprint(content, author=author,
+                           min_length=current_app.config.get('COMMENT_DUPLICATE_MIN_LENGTH', 40))
+
+    def _find_duplicate(self, fp, exclude_comment_id=None):
+        """
+        Classify a fingerprint against recent comments.
+
+        The in-memory window answers most lookups; the indexed fingerprint
+        table covers comments seen by other workers or before a restart.
+
+        Args:
+            fp: Fingerprint to look up
+            exclude_comment_id: Comment being edited, not compared with itself
+
+        Returns:
+            str: 'duplicate', 'near_duplicate' or None
+        """
+        if exclude_comment_id is None:
+            match = self._get_recent_fingerprints().match(fp)
+            if match:
+                return match
+
+        window = current_app.config.get('COMMENT_DUPLICATE_WINDOW', 24 * 60 * 60)
+        query = CommentFingerprint.query.with_entities(CommentFingerprint.key).filter(
+            CommentFingerprint.key.in_(fp.keys),
+            CommentFingerprint.created_at >= datetime.utcnow() - timedelta(seconds=window)
+        )
+        if exclude_comment_id is not None:
+            query = query.filter(CommentFingerprint.comment_id != exclude_comment_id)
+
+        return classify_match(fp, {key for (key,) in query.distinct().all()})
+
+    def _screen_duplicate(self, fp, status, exclude_comment_id=None):
+        """
+        Apply the configured duplicate policy.
+
+        Returns:
+            tuple: (status, error_message)
+        """
+        match = self._find_duplicate(fp, exclude_comment_id)
+        if not match:
+            return status, None
+
+        config_key = 'COMMENT_EXACT_DUPLICATE_ACTION' if match == 'duplicate' \
+            else 'COMMENT_NEAR_DUPLICATE_ACTION'
+        action = current_app.config.get(config_key, 'flag')
+
+        if action == 'reject':
+            return None, 'Duplicate comment detected'
+        if action == 'flag':
+            return 'pending', None
+        return status, None
+
+    def _build_fingerprints(self, fp):
+        return [CommentFingerprint(key=key) for key in fp.keys]
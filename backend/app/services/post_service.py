@@ -1,10 +1,16 @@
 """
 Post Service - Blog post CRUD operations
 """
-from datetime import datetime
-from ..models import Post, Tag
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from ..models import Post, Tag, Upload, Comment, post_tags
 from ..extensions import db
-from ..utils import save_image, delete_image
+from ..utils import save_image, delete_image, load_image_manifest, image_references, recover_uploads
+from ..utils.images import build_srcset
+from ..utils.db import read_only, write_transaction
 
 
 class PostService:
@@ -13,14 +19,15 @@ class PostService:
     All post-related business logic is encapsulated here.
     """
     
+    @read_only
     def get_published_posts(self, page=1, per_page=10):
         """Get paginated list of published posts"""
-        pagination = Post.query.filter_by(status='published')\
+        pagination = Post.query.options(joinedload(Post.author)).filter_by(status='published')\
             .order_by(Post.published_at.desc())\
             .paginate(page=page, per_page=per_page, error_out=False)
         
         return {
-            'posts': [post.to_dict(include_content=False) for post in pagination.items],
+            'posts': self._list_dicts(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -30,7 +37,7 @@ class PostService:
     
     def get_all_posts(self, page=1, per_page=10, status=None):
         """Get all posts (admin view) with optional status filter"""
-        query = Post.query.order_by(Post.created_at.desc())
+        query = Post.query.options(joinedload(Post.author)).order_by(Post.created_at.desc())
 
         if status:
             query = query.filter_by(status=status)
@@ -38,7 +45,7 @@ class PostService:
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
         return {
-            'posts': [post.to_dict(include_content=False) for post in pagination.items],
+            'posts': self._list_dicts(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -48,7 +55,8 @@ class PostService:
 
     def get_user_posts(self, user_id, page=1, per_page=10, status=None):
         """Get posts created by a specific user"""
-        query = Post.query.filter_by(author_id=user_id).order_by(Post.created_at.desc())
+        query = Post.query.options(joinedload(Post.author)).filter_by(author_id=user_id)\
+            .order_by(Post.created_at.desc())
 
         if status:
             query = query.filter_by(status=status)
@@ -56,7 +64,7 @@ class PostService:
         pagination = query.paginate(page=page, per_page=per_page, error_out=False)
 
         return {
-            'posts': [post.to_dict(include_content=False) for post in pagination.items],
+            'posts': self._list_dicts(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -64,6 +72,7 @@ class PostService:
             'has_prev': pagination.has_prev
         }
 
+    @read_only
     def get_post_by_slug(self, slug, published_only=True):
         """Get a single post by slug"""
         query = Post.query.filter_by(slug=slug)
@@ -79,6 +88,7 @@ class PostService:
         post = Post.query.get(post_id)
         return post.to_dict() if post else None
     
+    @read_only
     def get_posts_by_tag(self, tag_slug, page=1, per_page=10):
         """Get published posts filtered by tag"""
         tag = Tag.query.filter_by(slug=tag_slug).first()
@@ -92,14 +102,14 @@ class PostService:
                 'tag': None
             }
         
-        pagination = Post.query.filter(
+        pagination = Post.query.options(joinedload(Post.author)).filter(
             Post.tags.contains(tag),
             Post.status == 'published'
         ).order_by(Post.published_at.desc())\
          .paginate(page=page, per_page=per_page, error_out=False)
         
         return {
-            'posts': [post.to_dict(include_content=False) for post in pagination.items],
+            'posts': self._list_dicts(pagination.items),
             'total': pagination.total,
             'pages': pagination.pages,
             'current_page': page,
@@ -108,6 +118,7 @@ class PostService:
             'tag': tag.to_dict()
         }
     
+    @write_transaction()
     def create_post(self, title, content, author_id, excerpt=None, tags=None, 
                     featured_image=None, status='draft'):
         """Create a new blog post"""
@@ -127,7 +138,8 @@ class PostService:
                 excerpt=excerpt or content[:200] + '...' if len(content) > 200 else content,
                 author_id=author_id,
                 status=status,
-                featured_image=featured_image
+                featured_image=featured_image,
+                featured_image_meta=load_image_manifest(featured_image)
             )
             
             # Set published_at if publishing
@@ -138,8 +150,10 @@ class PostService:
             if tags:
                 post.tags = self._process_tags(tags)
             
+            self._retain_images(self._image_refs(post))
             db.session.add(post)
             db.session.commit()
+            self._refresh_pending_image(post)
             
             return post.to_dict(), None
         
@@ -147,6 +161,7 @@ class PostService:
             db.session.rollback()
             return None, f'Failed to create post: {str(e)}'
     
+    @write_transaction()
     def update_post(self, post_id, **kwargs):
         """Update an existing post"""
         try:
@@ -154,6 +169,8 @@ class PostService:
             if not post:
                 return None, 'Post not found'
             
+            old_refs = self._image_refs(post)
+            
             # Update fields
             if 'title' in kwargs:
                 post.title = kwargs['title']
@@ -174,10 +191,8 @@ class PostService:
                 post.excerpt = kwargs['excerpt']
             
             if 'featured_image' in kwargs:
-                # Delete old image if exists
-                if post.featured_image and post.featured_image != kwargs['featured_image']:
-                    delete_image(post.featured_image)
                 post.featured_image = kwargs['featured_image']
+                post.featured_image_meta = load_image_manifest(post.featured_image)
             
             if 'status' in kwargs:
                 # Set published_at when first published
@@ -188,13 +203,20 @@ class PostService:
             if 'tags' in kwargs:
                 post.tags = self._process_tags(kwargs['tags'])
             
+            new_refs = self._image_refs(post)
+            self._retain_images(new_refs - old_refs)
+            self._release_images(old_refs - new_refs)
+            
             db.session.commit()
+            self._collect_images(old_refs - new_refs)
+            self._refresh_pending_image(post)
             return post.to_dict(), None
         
         except Exception as e:
             db.session.rollback()
             return None, f'Failed to update post: {str(e)}'
     
+    @write_transaction()
     def delete_post(self, post_id):
         """Delete a post"""
         try:
@@ -202,12 +224,12 @@ class PostService:
             if not post:
                 return False, 'Post not found'
             
-            # Delete featured image
-            if post.featured_image:
-                delete_image(post.featured_image)
+            refs = self._image_refs(post)
+            self._release_images(refs)
             
             db.session.delete(post)
             db.session.commit()
+            self._collect_images(refs)
             return True, None
         
         except Exception as e:
@@ -216,18 +238,151 @@ class PostService:
     
     def upload_image(self, file):
         """Upload an image for a post"""
-        image_path = save_image(file, 'posts')
+        image_path = save_image(file, 'posts', on_ready=self._apply_image_manifest)
+        if image_path and self._register_upload(image_path) and not load_image_manifest(image_path):
+            # Collected between the duplicate check and the registration: store it again
+            file.stream.seek(0)
+            image_path = save_image(file, 'posts', on_ready=self._apply_image_manifest)
         if image_path:
-            return {'image_url': image_path}, None
+            return self.get_upload_status(image_path), None
         return None, 'Failed to upload image'
+
+    def get_upload_status(self, image_url):
+        """Processing status and variants of an uploaded image"""
+        manifest = load_image_manifest(image_url)
+        if not manifest:
+            return None
+        return {
+            'image_url': image_url,
+            'status': manifest.get('status', 'ready'),
+            'variants': manifest.get('variants', []),
+            'srcset': build_srcset(manifest.get('variants')),
+            'placeholder': manifest.get('placeholder')
+        }
+
+    @write_transaction()
+    def _apply_image_manifest(self, manifest):
+        """Attach a finished manifest to posts already using the image"""
+        Post.query.filter_by(featured_image=manifest['src']).update(
+            {'featured_image_meta': manifest}, synchronize_session=False
+        )
+        db.session.commit()
+
+    def recover_uploads(self, stale_seconds):
+        """Finish uploads whose processing job was lost (see recover_uploads)"""
+        return recover_uploads(stale_seconds, on_ready=self._apply_image_manifest)
+
+    def _refresh_pending_image(self, post):
+        """
+        Pick up a manifest that finished while the post was being saved.
+
+        Processing writes the manifest before notifying, so either the
+        notification sees this post or this check sees the manifest.
+        """
+        meta = post.featured_image_meta
+        if not meta or meta.get('status') != 'processing':
+            return
+
+        manifest = load_image_manifest(post.featured_image)
+        if manifest and manifest.get('status') != 'processing':
+            post.featured_image_meta = manifest
+            db.session.commit()
+
+    # ---- Upload reference counting ---- #
+
+    def _image_refs(self, post):
+        """Digests of the uploads a post references"""
+        return image_references(post.featured_image, post.content)
+
+    @write_transaction()
+    def _register_upload(self, image_url):
+        """
+        Track a stored upload; identical re-uploads share the row.
+
+        Every upload takes a pending reference by refreshing
+        last_uploaded_at, which keeps _collect_images away from the files
+        until the uploader has had time to save them into a post.
+
+        Returns:
+            bool: True if the row was created
+        """
+        digest = next(iter(image_references(image_url)), None)
+        if not digest:
+            return False
+
+        try:
+            refreshed = Upload.query.filter_by(digest=digest).update(
+                {Upload.last_uploaded_at: datetime.utcnow()}, synchronize_session=False
+            )
+            if not refreshed:
+                db.session.add(Upload(digest=digest, url=image_url))
+            db.session.commit()
+            return not refreshed
+        except IntegrityError:
+            # Registered concurrently by an identical upload
+            db.session.rollback()
+            return False
+
+    def _retain_images(self, digests):
+        if digests:
+            Upload.query.filter(Upload.digest.in_(digests)).update(
+                {Upload.ref_count: Upload.ref_count + 1}, synchronize_session=False
+            )
+
+    def _release_images(self, digests):
+        if digests:
+            Upload.query.filter(Upload.digest.in_(digests)).update(
+                {Upload.ref_count: Upload.ref_count - 1}, synchronize_session=False
+            )
+
+    def _collect_images(self, digests):
+        """
+        Remove released uploads that have no references left.
+
+        Runs after the releasing commit. The row is deleted first and only
+        while still unreferenced, so a post retaining the image in the
+        meantime keeps its files. Uploads with a pending reference (see
+        _register_upload) are left to `flask gc-uploads`.
+        """
+        if not digests:
+            return
+
+        pending_since = datetime.utcnow() - timedelta(hours=current_app.config.get('UPLOAD_PENDING_HOURS', 24))
+        unreferenced = Upload.query.with_entities(Upload.id, Upload.url).filter(
+            Upload.digest.in_(digests), Upload.ref_count <= 0, Upload.last_uploaded_at < pending_since
+        ).all()
+        for upload_id, url in unreferenced:
+            deleted = Upload.query.filter(
+                Upload.id == upload_id, Upload.ref_count <= 0, Upload.last_uploaded_at < pending_since
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if deleted:
+                delete_image(url)
     
+    @read_only
     def get_all_tags(self):
         """Get all tags with post counts"""
-        tags = Tag.query.all()
+        counts = dict(
+            db.session.query(post_tags.c.tag_id, func.count())
+            .join(Post, Post.id == post_tags.c.post_id)
+            .filter(Post.status == 'published')
+            .group_by(post_tags.c.tag_id)
+        )
         return [{
             **tag.to_dict(),
-            'post_count': tag.posts.filter_by(status='published').count()
-        } for tag in tags]
+            'post_count': counts.get(tag.id, 0)
+        } for tag in Tag.query.all()]
+
+    def _list_dicts(self, posts):
+        """Summaries of a page of posts with one approved-comment count query for all of them"""
+        counts = {}
+        if posts:
+            counts = dict(
+                db.session.query(Comment.post_id, func.count(Comment.id))
+                .filter(Comment.post_id.in_([post.id for post in posts]), Comment.status == 'approved')
+                .group_by(Comment.post_id)
+            )
+        return [post.to_dict(include_content=False, comment_count=counts.get(post.id, 0)) for post in posts]
     
     def _process_tags(self, tag_names):
         """Process tag names and return Tag objects"""
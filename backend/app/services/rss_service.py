@@ -1,17 +1,112 @@
 """
-RSS Service - Generate RSS feed for blog posts
+RSS Service - Generate RSS, Atom and JSON feeds for blog posts
 """
-from datetime import datetime
-from ..models import Post
-import PyRSS2Gen
+import hashlib
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, joinedload, noload
+from ..models import Post, Tag, User
+from ..extensions import db
+from ..utils.cache import TTLCache
+from ..utils.feeds import FEED_FORMATS, STREAMING_FEED_FORMATS
+from ..utils.db import read_only, primary_reads
+
+
+# Item lists per feed scope: (tag, author, limit) -> (feed meta, items) or None
+_item_cache = TTLCache(maxsize=256, ttl=300, name='rss_items')
+# Rendered feeds: (format, tag, author, limit) -> (body, etag, last_modified)
+_feed_cache = TTLCache(maxsize=512, ttl=300, name='rss_feeds')
+# (format, tag, author, limit) -> (etag, last_modified) of the last render,
+# kept across invalidations to tell whether a re-render changed the feed
+_feed_validators = TTLCache(maxsize=512, ttl=7 * 24 * 60 * 60)
+# Monotonic time of this process's last committed post change
+_last_change = 0.0
+# Bumped on every invalidation; renders that overlap one are not cached
+_generation = 0
+# Feeds first rendered by this process count as modified since it started
+_started_at = datetime.utcnow()
 
 
 class RSSService:
     """
     RSS feed service following IoC principle.
-    Generates RSS 2.0 feed for published blog posts.
+    Generates RSS 2.0, Atom and JSON feeds for published blog posts,
+    globally or for a single tag or author.
     """
     
+    @read_only
+    def get_feed(self, base_url='http://localhost:5000', fmt='rss', tag=None, author=None, limit=20):
+        """
+        Get a rendered feed with its validators, rendering on a cache miss.
+
+        All formats of a feed are rendered from one cached item list, so a
+        new format costs a render but no query. Entries live for
+        RSS_CACHE_TTL seconds and are dropped whenever this process commits
+        a change to a post; other processes pick up changes on expiry.
+        last_modified is when the rendered feed last changed (see
+        _last_modified), not the newest item date, which unpublished or
+        deleted posts do not move.
+        
+        Args:
+            base_url: The base URL of the blog, the same on every call
+                (SITE_URL): cached feeds are not keyed on it
+            fmt: 'rss', 'atom' or 'json'
+            tag: Tag slug to restrict the feed to
+            author: Username to restrict the feed to
+            limit: Maximum number of posts to include
+        
+        Returns:
+            tuple: (body bytes, etag, last_modified), or None if the tag
+            or author does not exist
+        """
+        key = (fmt, tag, author, limit)
+        entry = _feed_cache.get(key)
+        if entry is None:
+            generation = _generation
+            scope = self._get_items(tag, author, limit)
+            if scope is None:
+                return None
+
+            meta, items = scope
+            feed, feed_items = self._with_links(meta, items, base_url, fmt, tag, author)
+            renderer, _ = FEED_FORMATS[fmt]
+            body = renderer(feed, feed_items)
+            etag = hashlib.md5(body).hexdigest()
+            entry = (body, etag, self._last_modified(key, etag, meta['updated'], generation == _generation))
+            if generation == _generation:
+                _feed_cache.set(key, entry, current_app.config.get('RSS_CACHE_TTL', 300))
+        return entry
+
+    def _last_modified(self, key, etag, newest, current):
+        """
+        Last-Modified of a freshly rendered feed.
+
+        A render whose ETag differs from the previous render of the same
+        feed changed it now, which also covers posts leaving the feed.
+        Feeds this process has not rendered before count as changed at
+        its start, so clients refetch once after a restart rather than
+        keep a stale copy. Never earlier than the newest item.
+
+        Args:
+            current: False if an invalidation overlapped the render, whose
+                validators are then not remembered
+        """
+        previous = _feed_validators.get(key)
+        if previous is None:
+            changed = _started_at
+        elif previous[0] == etag:
+            changed = previous[1]
+        else:
+            # HTTP dates have whole seconds: always move past the previous value
+            changed = max(datetime.utcnow(), previous[1] + timedelta(seconds=1))
+
+        last_modified = max(changed, newest) if newest else changed
+        if current:
+            _feed_validators.set(key, (etag, last_modified))
+        return last_modified
+
     def generate_feed(self, base_url='http://localhost:5000', limit=20):
         """
         Generate RSS feed XML for published posts.
@@ -21,46 +116,194 @@ class RSSService:
             limit: Maximum number of posts to include
         
         Returns:
-            str: RSS feed XML string
+            bytes: RSS feed XML
         """
-        posts = Post.query.filter_by(status='published')\
+        return self.get_feed(base_url, limit=limit)[0]
+
+    @read_only
+    def stream_feed(self, base_url='http://localhost:5000', fmt='rss', tag=None, author=None, limit=20):
+        """
+        Stream a full-content feed without building it in memory.
+
+        Posts are read through a server-side cursor in batches of
+        RSS_STREAM_BATCH_SIZE and written out one item at a time, so the
+        first bytes go out immediately and memory stays flat whatever the
+        limit. Not cached: meant for archive and full-text consumers.
+        
+        Returns:
+            iterator: Encoded chunks, or None if the tag or author does not exist
+        """
+        scope = self._resolve_scope(tag, author)
+        if scope is None:
+            return None
+
+        meta, filters = scope
+        # Newest item date without reading the stream first
+        meta['updated'] = db.session.query(func.max(func.coalesce(Post.updated_at, Post.published_at)))\
+            .filter(Post.status == 'published', *filters).scalar()
+        feed, _ = self._with_links(meta, [], base_url, fmt, tag, author)
+
+        # Executed now, while read_only routing applies; rows are fetched
+        # in batches as the response is written
+        rows = db.session.execute(
+            select(
+                Post.title, Post.slug, Post.excerpt, Post.content,
+                Post.published_at, Post.created_at, Post.updated_at, User.username
+            ).outerjoin(User, User.id == Post.author_id)
+            .where(Post.status == 'published', *filters)
+            .order_by(Post.published_at.desc())
+            .limit(limit)
+            .execution_options(
+                stream_results=True,
+                yield_per=current_app.config.get('RSS_STREAM_BATCH_SIZE', 100)
+            )
+        )
+
+        items = ({
+            'title': row.title,
+            'link': f"{base_url}/blog/{row.slug}",
+            'summary': row.excerpt or row.content[:300],
+            'content': row.content,
+            'author': row.username or 'Admin',
+            'published': row.published_at or row.created_at,
+            'updated': row.updated_at
+        } for row in rows)
+        return STREAMING_FEED_FORMATS[fmt](feed, items)
+
+    def invalidate(self):
+        """Drop all cached feeds in this process"""
+        _clear_caches()
+
+    def _get_items(self, tag, author, limit):
+        key = (tag, author, limit)
+        scope = _item_cache.get(key, default=False)
+        if scope is False:
+            generation = _generation
+            if time.monotonic() - _last_change < current_app.config.get('REPLICA_STICKY_SECONDS', 10):
+                # Replicas may not have the change yet: don't cache their view
+                with primary_reads():
+                    scope = self._load_items(tag, author, limit)
+            else:
+                scope = self._load_items(tag, author, limit)
+            if generation == _generation:
+                _item_cache.set(key, scope, current_app.config.get('RSS_CACHE_TTL', 300))
+        return scope
+
+    def _resolve_scope(self, tag, author):
+        """
+        Feed title/description and post filters for a tag or author feed.
+
+        Returns:
+            tuple: (meta dict, list of filter clauses), or None if not found
+        """
+        meta = {'title': 'Blog Platform', 'description': 'Latest blog posts from our platform'}
+        filters = []
+        
+        if tag:
+            tag_row = Tag.query.filter_by(slug=tag).first()
+            if not tag_row:
+                return None
+            filters.append(Post.tags.contains(tag_row))
+            meta = {'title': f'Blog Platform - {tag_row.name}', 'description': f'Latest posts tagged {tag_row.name}'}
+        
+        if author:
+            user = User.query.filter_by(username=author).first()
+            if not user:
+                return None
+            filters.append(Post.author_id == user.id)
+            meta = {'title': f'Blog Platform - {user.username}', 'description': f'Latest posts by {user.username}'}
+        
+        return meta, filters
+
+    def _load_items(self, tag, author, limit):
+        """Query one feed's posts into plain, base-URL independent item dicts"""
+        scope = self._resolve_scope(tag, author)
+        if scope is None:
+            return None
+        meta, filters = scope
+        
+        # One query: authors joined in, tags (lazy='subquery') not loaded
+        posts = Post.query.options(joinedload(Post.author), noload(Post.tags))\
+            .filter(Post.status == 'published', *filters)\
             .order_by(Post.published_at.desc())\
             .limit(limit)\
             .all()
         
-        items = []
-        for post in posts:
-            items.append(
-                PyRSS2Gen.RSSItem(
-                    title=post.title,
-                    link=f"{base_url}/blog/{post.slug}",
-                    description=post.excerpt or post.content[:300],
-                    author=post.author.username if post.author else 'Admin',
-                    guid=PyRSS2Gen.Guid(f"{base_url}/blog/{post.slug}"),
-                    pubDate=post.published_at or post.created_at
-                )
-            )
-        
-        rss = PyRSS2Gen.RSS2(
-            title="Blog Platform",
-            link=base_url,
-            description="Latest blog posts from our platform",
-            lastBuildDate=datetime.utcnow(),
-            items=items
-        )
+        items = [{
+            'title': post.title,
+            'slug': post.slug,
+            'summary': post.excerpt or post.content[:300],
+            'author': post.author.username if post.author else 'Admin',
+            'published': post.published_at or post.created_at,
+            'updated': post.updated_at
+        } for post in posts]
         
-        return rss.to_xml('utf-8')
+        meta['updated'] = max((item['updated'] or item['published'] for item in items), default=None)
+        return meta, items
+
+    def _with_links(self, meta, items, base_url, fmt, tag, author):
+        if tag:
+            path = f'/api/rss/tags/{tag}'
+        elif author:
+            path = f'/api/rss/authors/{author}'
+        else:
+            path = '/api/rss'
+        feed = {
+            **meta,
+            'link': base_url,
+            'self_url': f'{base_url}{path}' + ('' if fmt == 'rss' else f'?format={fmt}')
+        }
+        feed_items = [{**item, 'link': f"{base_url}/blog/{item['slug']}"} for item in items]
+        return feed, feed_items
     
+    @read_only
     def get_feed_info(self, base_url='http://localhost:5000'):
         """Get basic feed information"""
-        post_count = Post.query.filter_by(status='published').count()
-        latest_post = Post.query.filter_by(status='published')\
-            .order_by(Post.published_at.desc())\
-            .first()
+        post_count, last_published = db.session.query(
+            func.count(Post.id), func.max(Post.published_at)
+        ).filter(Post.status == 'published').one()
         
         return {
             'title': 'Blog Platform RSS Feed',
             'url': f"{base_url}/api/rss",
+            'formats': {fmt: f"{base_url}/api/rss?format={fmt}" for fmt in FEED_FORMATS},
             'post_count': post_count,
-            'last_updated': latest_post.published_at.isoformat() if latest_post else None
+            'last_updated': last_published.isoformat() if last_published else None
         }
+
+
+# ---- Cache invalidation ---- #
+
+@event.listens_for(Session, 'after_flush')
+def _mark_posts_changed(session, flush_context):
+    if any(isinstance(obj, Post) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['rss_stale'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_bulk_post_changes(orm_execute_state):
+    # Query.update() / delete() bypass the flush, so after_flush never sees them
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            any(mapper.class_ is Post for mapper in orm_execute_state.all_mappers):
+        orm_execute_state.session.info['rss_stale'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_feeds(session):
+    # A render that read the pre-commit state may still be running; the
+    # generation bump keeps it from caching its result
+    if session.info.pop('rss_stale', False):
+        _clear_caches()
+
+
+def _clear_caches():
+    global _last_change, _generation
+    _last_change = time.monotonic()
+    _generation += 1
+    _item_cache.clear()
+    _feed_cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_post_changes(session):
+    session.info.pop('rss_stale', None)
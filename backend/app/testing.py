@@ -0,0 +1,50 @@
+"""
+Pytest Plugin - Query budget fixtures
+
+Enable in a conftest.py with `pytest_plugins = ['app.testing']`. The
+fixtures use pytest-flask's `client`, so the conftest provides the `app`
+fixture (and a seeded database: budgets only catch N+1 patterns when
+pages are full).
+"""
+import pytest
+
+from .utils.query_budget import count_queries, route_budget
+
+
+@pytest.fixture
+def query_counter():
+    """
+    The count_queries context manager:
+
+        with query_counter() as queries:
+            post_service.get_all_tags()
+        assert queries.count == 2
+    """
+    return count_queries
+
+
+@pytest.fixture
+def assert_query_budget(client):
+    """
+    Request a path and fail if it runs more SQL statements than its
+    route's @query_budget (or an explicit budget).
+
+        def test_post_list(assert_query_budget):
+            assert_query_budget('/api/posts?per_page=50')
+
+    Returns the response.
+    """
+    def check(path, method='GET', budget=None, **kwargs):
+        limit = budget if budget is not None else route_budget(client.application, path, method)
+        assert limit is not None, f'{method} {path} has no query budget'
+
+        with count_queries(limit) as queries:
+            response = client.open(path, method=method, **kwargs)
+
+        statements = '\n'.join(queries.statements)
+        assert not queries.exceeded, (
+            f'{method} {path} ran {queries.count} SQL statements, budget {limit}:\n'
+            f'{statements}\nFirst statement over budget issued from:\n{queries.offending_stack}'
+        )
+        return response
+    return check
@@ -1,7 +1,22 @@
 """
 Utility modules package
 """
-from .jwt_utils import admin_required, user_required, get_current_user, get_current_admin
-from .file_upload import save_image, delete_image, allowed_file
+from .jwt_utils import (
+    admin_required, user_required, get_current_user, get_current_admin, invalidate_cached_user, token_claims
+)
+from .revocation import revocation_list
+from .file_upload import (
+    save_image, delete_image, allowed_file, load_image_manifest, find_upload, image_references, send_upload,
+    recover_uploads
+)
+from .thumbnails import thumbnail_cache
+from .fingerprint import fingerprint, RecentFingerprintWindow
+from .rate_limit import limiter, rate_limit
+from .passwords import password_hasher, PasswordHasherBusy
 
-__all__ = ['admin_required', 'user_required', 'get_current_user', 'get_current_admin', 'save_image', 'delete_image', 'allowed_file']
+__all__ = ['admin_required', 'user_required', 'get_current_user', 'get_current_admin',
+           'invalidate_cached_user', 'token_claims', 'revocation_list',
+           'save_image', 'delete_image', 'allowed_file', 'load_image_manifest', 'find_upload',
+           'image_references', 'send_upload', 'recover_uploads', 'thumbnail_cache',
+           'fingerprint', 'RecentFingerprintWindow', 'limiter', 'rate_limit',
+           'password_hasher', 'PasswordHasherBusy']
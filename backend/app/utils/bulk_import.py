@@ -0,0 +1,55 @@
+"""
+Bulk Import Utilities - Stream records from CSV or NDJSON input
+"""
+import csv
+import io
+import json
+
+
+SUPPORTED_FORMATS = ('csv', 'ndjson')
+
+
+def detect_format(content_type=None, filename=None):
+    """Guess the record format from a content type or filename"""
+    content_type = (content_type or '').lower()
+    filename = (filename or '').lower()
+
+    if 'csv' in content_type or filename.endswith('.csv'):
+        return 'csv'
+    if 'ndjson' in content_type or 'jsonl' in content_type or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def iter_records(stream, fmt):
+    """
+    Lazily yield one dict per record from a binary stream.
+
+    Malformed records are yielded as {'_error': message} so that callers
+    can report them by position without aborting the whole import.
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    if not isinstance(stream, io.BufferedIOBase):
+        stream = io.BufferedReader(stream)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        for row in csv.DictReader(text):
+            yield {
+                (key or '').strip(): (value or '').strip() if isinstance(value, str) else value
+                for key, value in row.items()
+            }
+        return
+
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield {'_error': 'Invalid JSON'}
+            continue
+        yield record if isinstance(record, dict) else {'_error': 'Record must be a JSON object'}
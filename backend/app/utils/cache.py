@@ -0,0 +1,73 @@
+"""
+In-Process Caching - Small thread-safe TTL cache
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+# name -> TTLCache, for caches reporting hit ratios (see cache_stats)
+_named_caches = {}
+
+
+def cache_stats():
+    """Hits and misses of every named cache in this process: {name: (hits, misses)}"""
+    return {name: (cache.hits, cache.misses) for name, cache in _named_caches.items()}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Each worker process holds its own copy, so TTLs should be short
+    enough that cross-process staleness is acceptable. Hits and misses
+    are counted; caches given a name are reported in the metrics.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            _named_caches[name] = self
+
+    def get(self, key, default=None):
+        """Return a cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entry if full"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,307 @@
+"""
+Synthetic Data - Deterministic generation of large blog datasets
+
+Rows are generated in fixed-size chunks, each from its own seed, by a
+pool of worker processes, and written in chunk order: the same spec
+always produces the same database, whatever the number of workers.
+Workers format PostgreSQL chunks as COPY input, which the writer streams
+with COPY FROM STDIN; other databases get Core executemany inserts.
+
+Tags follow a Zipf distribution (tag id n is the n-th most popular).
+Comment counts are long-tailed, and a share of posts draws a burst of
+comments in the hours after publication.
+"""
+import io
+import math
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+
+# Rows per generated chunk: part of each chunk's seed, so changing it changes the data
+CHUNK_ROWS = 2000
+
+WORDS = (
+    'api application async backend benchmark browser build cache client cloud code '
+    'component config container data database debug deploy design developer docker '
+    'error event feature flask framework frontend function git http index interface '
+    'javascript json latency library linux memory migration model module network '
+    'object optimize package performance pipeline pool postgres production python '
+    'query queue react release request response route schema script security server '
+    'service session sql stack storage stream system table template test thread '
+    'token transaction type update user value version view web worker workflow'
+).split()
+
+USER_COLUMNS = ('id', 'email', 'username', 'password_hash', 'is_admin', 'token_version', 'created_at', 'updated_at')
+TAG_COLUMNS = ('id', 'name', 'slug')
+POST_COLUMNS = ('id', 'title', 'slug', 'content', 'excerpt', 'status', 'author_id',
+                'created_at', 'updated_at', 'published_at')
+POST_TAG_COLUMNS = ('post_id', 'tag_id')
+COMMENT_COLUMNS = ('post_id', 'author_id', 'guest_name', 'guest_email', 'content', 'status', 'created_at')
+
+
+def zipf_weights(n, exponent=1.1):
+    """Weights of ranks 1..n under a Zipf distribution"""
+    return [1 / rank ** exponent for rank in range(1, n + 1)]
+
+
+def dataset_spec(posts, users=None, tags=None, comments_per_post=5.0, seed=42, **options):
+    """
+    Describe a dataset, filling in the defaults derived from the post count.
+
+    Args:
+        posts: Number of posts
+        users: Number of users (default posts / 20); user 1 is an admin
+        tags: Number of tags (default sqrt(posts))
+        comments_per_post: Mean comments of an ordinary published post
+        seed: Seed of every random choice
+        **options: tag_exponent, max_tags_per_post, draft_ratio, burst_ratio
+            (share of posts with a comment burst), burst_size (how many
+            times more comments those get), days (publication span), end
+            (datetime of the newest post), admin_email and admin_username
+
+    Returns:
+        dict: The spec, JSON-serializable apart from end
+    """
+    spec = {
+        'posts': posts,
+        'users': users or max(10, posts // 20),
+        'tags': tags or max(20, int(math.sqrt(posts))),
+        'comments_per_post': comments_per_post,
+        'seed': seed,
+        'tag_exponent': 1.1,
+        'max_tags_per_post': 4,
+        'draft_ratio': 0.1,
+        'burst_ratio': 0.02,
+        'burst_size': 20,
+        'days': 3 * 365,
+        'end': datetime(2024, 1, 1),
+        'admin_email': None,
+        'admin_username': None,
+    }
+    unknown = set(options) - set(spec)
+    if unknown:
+        raise ValueError(f"Unknown dataset options: {', '.join(sorted(unknown))}")
+    spec.update(options)
+    return spec
+
+
+# ---- Row generation (worker processes) ---- #
+
+def _sentence(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + '.'
+
+
+def _paragraphs(rng, count):
+    return ''.join(
+        '<p>' + ' '.join(_sentence(rng, 8, 20) for _ in range(rng.randint(3, 6))) + '</p>'
+        for _ in range(count)
+    )
+
+
+def _user_rows(spec, rng, start, stop, password_hashes):
+    first_day = spec['end'] - timedelta(days=spec['days'])
+    for user_id in range(start, stop):
+        admin = user_id == 1
+        created_at = first_day + timedelta(seconds=rng.randrange(86400))
+        yield (
+            user_id,
+            admin and spec['admin_email'] or f'user{user_id}@example.com',
+            admin and spec['admin_username'] or f'user{user_id}',
+            password_hashes[0 if admin else 1],
+            admin,
+            0,
+            created_at,
+            created_at,
+        )
+
+
+def _tag_rows(spec, rng, start, stop):
+    for tag_id in range(start, stop):
+        name = f'{rng.choice(WORDS).title()} {tag_id}'
+        yield tag_id, name, f'tag-{tag_id}'
+
+
+def _post_rows(spec, rng, start, stop):
+    """Posts with their tag links and comments: (posts, post_tags, comments)"""
+    posts, links, comments = [], [], []
+    tag_ids = range(1, spec['tags'] + 1)
+    cum_weights = list(accumulate(zipf_weights(spec['tags'], spec['tag_exponent'])))
+    span = spec['days'] * 86400
+    end = spec['end']
+
+    for post_id in range(start, stop):
+        words = rng.choices(WORDS, k=rng.randint(4, 9))
+        published_at = end - timedelta(seconds=rng.randrange(span))
+        published = rng.random() >= spec['draft_ratio']
+        posts.append((
+            post_id,
+            ' '.join(words).capitalize(),
+            f"{'-'.join(words)}-{post_id}",
+            _paragraphs(rng, rng.randint(2, 6)),
+            _sentence(rng, 15, 30),
+            'published' if published else 'draft',
+            rng.randint(1, spec['users']),
+            published_at,
+            published_at,
+            published_at if published else None,
+        ))
+
+        for tag_id in sorted(set(rng.choices(tag_ids, cum_weights=cum_weights,
+                                             k=rng.randint(1, spec['max_tags_per_post'])))):
+            links.append((post_id, tag_id))
+
+        if not published or not spec['comments_per_post']:
+            continue
+        # Long tail: most posts get a few comments, bursting ones get many within hours
+        burst = rng.random() < spec['burst_ratio']
+        mean = spec['comments_per_post'] * (spec['burst_size'] if burst else 1)
+        mean_delay_hours = 6 if burst else 48
+        for _ in range(int(rng.expovariate(1 / mean))):
+            registered = rng.random() < 0.3
+            guest = rng.randint(1, 10_000)
+            created_at = published_at + timedelta(hours=rng.expovariate(1 / mean_delay_hours))
+            comments.append((
+                post_id,
+                rng.randint(1, spec['users']) if registered else None,
+                None if registered else f'Guest {guest}',
+                None if registered else f'guest{guest}@example.com',
+                _sentence(rng, 5, 40),
+                'approved' if rng.random() < 0.9 else 'pending',
+                min(created_at, end),
+            ))
+
+    return posts, links, comments
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+def _copy_text(rows):
+    """Rows in PostgreSQL COPY text format"""
+    return ''.join('\t'.join(map(_copy_value, row)) + '\n' for row in rows)
+
+
+def generate_chunk(spec, kind, start, stop, password_hashes=None, copy=False):
+    """
+    Generate the rows of one chunk.
+
+    Returns:
+        list: (table name, columns, rows) per table, rows as COPY text when copy is set
+    """
+    rng = random.Random(f"{spec['seed']}:{kind}:{start}")
+    if kind == 'users':
+        tables = [('users', USER_COLUMNS, list(_user_rows(spec, rng, start, stop, password_hashes)))]
+    elif kind == 'tags':
+        tables = [('tags', TAG_COLUMNS, list(_tag_rows(spec, rng, start, stop)))]
+    else:
+        posts, links, comments = _post_rows(spec, rng, start, stop)
+        tables = [
+            ('posts', POST_COLUMNS, posts),
+            ('post_tags', POST_TAG_COLUMNS, links),
+            ('comments', COMMENT_COLUMNS, comments),
+        ]
+    if copy:
+        return [(table, columns, _copy_text(rows)) for table, columns, rows in tables]
+    return tables
+
+
+# ---- Writing ---- #
+
+def _chunks(spec):
+    for kind in ('users', 'tags', 'posts'):
+        for start in range(1, spec[kind] + 1, CHUNK_ROWS):
+            yield kind, start, min(start + CHUNK_ROWS, spec[kind] + 1)
+
+
+def _write_chunk(engine, metadata, tables, copy):
+    """Insert one generated chunk in a single transaction; returns rows per table"""
+    counts = {}
+    with engine.begin() as connection:
+        for table, columns, rows in tables:
+            if not rows:
+                continue
+            if copy:
+                cursor = connection.connection.cursor()
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", io.StringIO(rows))
+                counts[table] = cursor.rowcount
+            else:
+                connection.execute(metadata.tables[table].insert(), [dict(zip(columns, row)) for row in rows])
+                counts[table] = len(rows)
+    return counts
+
+
+def generate_data(engine, metadata, spec, password_hashes, workers=None, progress=None):
+    """
+    Generate spec's dataset into empty tables.
+
+    Args:
+        engine: Engine of the target database
+        metadata: MetaData holding the tables
+        spec: dataset_spec() result
+        password_hashes: (admin hash, hash shared by every other user)
+        workers: Generator processes (default CPU count, 0 generates inline)
+        progress: Optional callable receiving (rows per table so far, chunks done, chunks total)
+
+    Returns:
+        dict: Rows inserted per table
+    """
+    copy = engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = list(_chunks(spec))
+    totals = dict.fromkeys(('users', 'tags', 'posts', 'post_tags', 'comments'), 0)
+
+    def record(tables, done):
+        for table, count in _write_chunk(engine, metadata, tables, copy).items():
+            totals[table] += count
+        if progress:
+            progress(totals, done, len(chunks))
+
+    if workers <= 0:
+        for done, (kind, start, stop) in enumerate(chunks, start=1):
+            record(generate_chunk(spec, kind, start, stop, password_hashes, copy), done)
+    else:
+        # A bounded window of chunks in flight keeps memory flat on millions of rows
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            done = 0
+            for kind, start, stop in chunks:
+                pending.append(executor.submit(generate_chunk, spec, kind, start, stop, password_hashes, copy))
+                if len(pending) >= workers * 2:
+                    done += 1
+                    record(pending.popleft().result(), done)
+            while pending:
+                done += 1
+                record(pending.popleft().result(), done)
+
+    _finish(engine)
+    return totals
+
+
+def _finish(engine):
+    """Move PostgreSQL id sequences past the explicit ids and refresh planner statistics"""
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as connection:
+        for table in ('users', 'tags', 'posts', 'comments'):
+            connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+            ))
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level='AUTOCOMMIT').execute(text('ANALYZE'))
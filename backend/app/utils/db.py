@@ -0,0 +1,268 @@
+"""
+Database Utilities - Replica routing, SQLite tuning, statement timeouts and pool statistics
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..extensions import db, replica_reads
+
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+# ---- Read replicas ---- #
+
+def read_only(fn):
+    """
+    Mark a service method as safe to answer from a read replica.
+
+    Only queries issued while the method runs are routed, so it should
+    return plain data (dicts, lists) rather than models with lazy loads
+    left for the caller.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = replica_reads.set(True)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary_reads():
+    """Keep queries in the block on the primary, even inside read_only methods"""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def init_replica_routing(app):
+    """
+    Read-your-writes for replica routing.
+
+    Requests with a valid access token always read from the primary:
+    the SPA authenticates with a bearer token from another origin and
+    never sends cookies back, so per-client stickiness cannot be tracked
+    for it. Anonymous readers stay on replicas; a request of theirs that
+    flushes anything (e.g. a guest comment) gets a cookie keeping same-site
+    reads on the primary for REPLICA_STICKY_SECONDS, longer than replicas
+    are expected to lag.
+    """
+    @app.before_request
+    def _check_sticky_cookie():
+        try:
+            g._db_sticky = float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            g._db_sticky = False
+        if not g._db_sticky and request.headers.get('Authorization'):
+            try:
+                verify_jwt_in_request(optional=True)
+                g._db_sticky = get_jwt_identity() is not None
+            except Exception:
+                # Invalid tokens are rejected by the route itself
+                pass
+
+    @app.after_request
+    def _set_sticky_cookie(response):
+        if g.get('_db_wrote'):
+            seconds = app.config.get('REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_request_wrote(session, flush_context):
+    if has_request_context():
+        g._db_wrote = True
+
+
+# ---- SQLite ---- #
+
+class WriteSlotBusy(TimeoutError):
+    """Raised when write_transaction gets no write slot within SQLITE_BUSY_TIMEOUT_MS"""
+
+
+# True inside write_transaction: transactions then start with BEGIN IMMEDIATE
+_sqlite_write = ContextVar('sqlite_write', default=False)
+_sqlite_write_lock = threading.Lock()
+
+
+def init_sqlite(app):
+    """
+    Tune the app's SQLite engines for several concurrent workers.
+
+    Every new connection gets the SQLITE_* pragmas: WAL lets readers run
+    alongside the writer, synchronous=NORMAL only syncs at checkpoints,
+    and busy_timeout makes a blocked writer wait instead of failing with
+    "database is locked". pysqlite's implicit BEGIN is replaced by our
+    own, so write_transaction can take the write lock up front. Engines
+    of other databases are left alone.
+    """
+    pragmas = {
+        'journal_mode': app.config.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'cache_size': -app.config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024),  # negative: KiB, not pages
+        'mmap_size': app.config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    }
+    with app.app_context():
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+
+    for engine in engines:
+        event.listen(engine, 'connect', partial(_sqlite_connect, pragmas))
+        event.listen(engine, 'begin', _sqlite_begin)
+
+
+def _sqlite_connect(pragmas, dbapi_connection, connection_record):
+    # Autocommit at the driver level: transactions are begun in _sqlite_begin
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
+def _sqlite_begin(connection):
+    # On the driver connection: a BEGIN is not a statement worth counting in metrics
+    connection.connection.driver_connection.execute('BEGIN IMMEDIATE' if _sqlite_write.get() else 'BEGIN')
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_session_flushed(session, flush_context):
+    session.info['flushed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _clear_session_flushed(session):
+    session.info.pop('flushed', None)
+
+
+@contextmanager
+def write_transaction():
+    """
+    Run a block of writes as the only writer, on SQLite.
+
+    Writers in this process queue on a lock, and the block's transaction
+    starts with BEGIN IMMEDIATE so writers in other processes queue on
+    SQLite's busy timeout. A deferred transaction that reads first and
+    writes later cannot wait like that: it fails with "database is
+    locked" as soon as another writer got in between.
+
+    A read transaction already open in the session is rolled back first
+    and the block's own transaction is committed (or rolled back on
+    error) at the end, so the lock is not held past the block. Nested
+    blocks join the outer one; on other databases this does nothing.
+
+    Usable as a decorator: @write_transaction()
+
+    Raises:
+        WriteSlotBusy: If the lock is not free within SQLITE_BUSY_TIMEOUT_MS;
+            the app answers it with 503 and Retry-After
+        RuntimeError: If the session holds unflushed or uncommitted changes,
+            which the block would otherwise commit as its own
+    """
+    if _sqlite_write.get() or db.engine.dialect.name != 'sqlite':
+        yield
+        return
+
+    timeout_ms = current_app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    if not _sqlite_write_lock.acquire(timeout=timeout_ms / 1000):
+        raise WriteSlotBusy(f'database is locked: no write slot within {timeout_ms}ms')
+
+    session = db.session()
+    try:
+        if session.new or session.dirty or session.deleted or session.info.get('flushed'):
+            raise RuntimeError('write_transaction entered with pending changes in the session')
+        if session.in_transaction():
+            session.rollback()
+        token = _sqlite_write.set(True)
+        try:
+            yield
+        except Exception:
+            session.rollback()
+            raise
+        else:
+            if session.in_transaction():
+                session.commit()
+        finally:
+            _sqlite_write.reset(token)
+    finally:
+        _sqlite_write_lock.release()
+
+
+# ---- Statement timeouts ---- #
+
+def statement_timeout(timeout):
+    """
+    Route decorator capping how long each SQL statement of the request may run.
+
+    SET LOCAL statement_timeout is issued when the request's transaction
+    begins on a connection, so requests answered from cache pay nothing,
+    the limit holds behind pgbouncer in transaction mode, and it ends with
+    the transaction. PostgreSQL only; a no-op elsewhere.
+
+    Args:
+        timeout: Milliseconds, or the name of a config key holding them
+            (0 disables)
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            ms = current_app.config.get(timeout, 0) if isinstance(timeout, str) else timeout
+            if ms:
+                g._statement_timeout_ms = int(ms)
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, 'after_begin')
+def _apply_statement_timeout(session, transaction, connection):
+    if not has_request_context():
+        return
+    ms = g.get('_statement_timeout_ms')
+    if ms and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {ms}')
+
+
+# ---- Pool statistics ---- #
+
+def all_pool_stats():
+    """Pool counters of the primary and every replica engine"""
+    stats = {'primary': pool_stats(db.engine)}
+    for key in current_app.config.get('DATABASE_REPLICA_BINDS', []):
+        stats[key] = pool_stats(db.engines[key])
+    return stats
+
+
+def pool_stats(engine=None):
+    """
+    Connection pool counters of an engine, for monitoring.
+
+    Returns:
+        dict: Pool class and, for queue pools, size / checked in / checked
+        out / overflow counts
+    """
+    pool = (engine or db.engine).pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
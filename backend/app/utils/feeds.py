@@ -0,0 +1,165 @@
+"""
+Feed Rendering - RSS 2.0, Atom and JSON Feed from one item list
+
+Every renderer takes the same feed dict and list of item dicts:
+
+    feed: {'title', 'link', 'self_url', 'description', 'updated'}
+    item: {'title', 'link', 'summary', 'author', 'published', 'updated'}
+
+Datetimes are naive UTC, as stored in the database.
+
+For large full-content feeds, stream_rss / stream_atom yield the document
+piece by piece from any item iterable (typically a server-side cursor),
+adding 'content' (full HTML) to each item.
+"""
+import json
+from datetime import datetime
+from xml.sax.saxutils import escape, quoteattr
+
+
+def _isoformat(value):
+    return value.replace(microsecond=0).isoformat() + 'Z' if value else None
+
+
+def _rfc822(value):
+    return value.strftime('%a, %d %b %Y %H:%M:%S GMT') if value else None
+
+
+def render_rss(feed, items):
+    """RSS 2.0 document as bytes"""
+    import PyRSS2Gen
+
+    rss = PyRSS2Gen.RSS2(
+        title=feed['title'],
+        link=feed['link'],
+        description=feed['description'],
+        lastBuildDate=feed['updated'] or datetime.utcnow(),
+        items=[
+            PyRSS2Gen.RSSItem(
+                title=item['title'],
+                link=item['link'],
+                description=item['summary'],
+                author=item['author'],
+                guid=PyRSS2Gen.Guid(item['link']),
+                pubDate=item['published']
+            )
+            for item in items
+        ]
+    )
+    return rss.to_xml('utf-8').encode('utf-8')
+
+
+def render_atom(feed, items):
+    """Atom 1.0 document as bytes"""
+    updated = _isoformat(feed['updated'] or datetime.utcnow())
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>{escape(feed['title'])}</title>",
+        f"<subtitle>{escape(feed['description'])}</subtitle>",
+        f"<link href={quoteattr(feed['link'])}/>",
+        f"<link rel=\"self\" href={quoteattr(feed['self_url'])}/>",
+        f"<id>{escape(feed['self_url'])}</id>",
+        f"<updated>{updated}</updated>",
+    ]
+    for item in items:
+        parts.append(
+            '<entry>'
+            f"<title>{escape(item['title'])}</title>"
+            f"<link href={quoteattr(item['link'])}/>"
+            f"<id>{escape(item['link'])}</id>"
+            f"<author><name>{escape(item['author'])}</name></author>"
+            f"<published>{_isoformat(item['published'])}</published>"
+            f"<updated>{_isoformat(item['updated'] or item['published'])}</updated>"
+            f"<summary>{escape(item['summary'])}</summary>"
+            '</entry>'
+        )
+    parts.append('</feed>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def render_json(feed, items):
+    """JSON Feed 1.1 document as bytes"""
+    document = {
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'description': feed['description'],
+        'home_page_url': feed['link'],
+        'feed_url': feed['self_url'],
+        'items': [
+            {
+                'id': item['link'],
+                'url': item['link'],
+                'title': item['title'],
+                'summary': item['summary'],
+                'authors': [{'name': item['author']}],
+                'date_published': _isoformat(item['published']),
+                'date_modified': _isoformat(item['updated'] or item['published'])
+            }
+            for item in items
+        ]
+    }
+    return json.dumps(document, ensure_ascii=False).encode('utf-8')
+
+
+def stream_rss(feed, items):
+    """Yield an RSS 2.0 document with full content in chunks of one item"""
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel>'
+        f"<title>{escape(feed['title'])}</title>"
+        f"<link>{escape(feed['link'])}</link>"
+        f"<description>{escape(feed['description'])}</description>"
+        f"<lastBuildDate>{_rfc822(feed['updated'] or datetime.utcnow())}</lastBuildDate>"
+    ).encode('utf-8')
+    for item in items:
+        yield (
+            '<item>'
+            f"<title>{escape(item['title'])}</title>"
+            f"<link>{escape(item['link'])}</link>"
+            f"<description>{escape(item['summary'])}</description>"
+            f"<content:encoded>{escape(item['content'])}</content:encoded>"
+            f"<author>{escape(item['author'])}</author>"
+            f"<guid>{escape(item['link'])}</guid>"
+            f"<pubDate>{_rfc822(item['published'])}</pubDate>"
+            '</item>'
+        ).encode('utf-8')
+    yield b'</channel></rss>'
+
+
+def stream_atom(feed, items):
+    """Yield an Atom 1.0 document with full content in chunks of one item"""
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{escape(feed['title'])}</title>"
+        f"<subtitle>{escape(feed['description'])}</subtitle>"
+        f"<link href={quoteattr(feed['link'])}/>"
+        f"<link rel=\"self\" href={quoteattr(feed['self_url'])}/>"
+        f"<id>{escape(feed['self_url'])}</id>"
+        f"<updated>{_isoformat(feed['updated'] or datetime.utcnow())}</updated>"
+    ).encode('utf-8')
+    for item in items:
+        yield (
+            '<entry>'
+            f"<title>{escape(item['title'])}</title>"
+            f"<link href={quoteattr(item['link'])}/>"
+            f"<id>{escape(item['link'])}</id>"
+            f"<author><name>{escape(item['author'])}</name></author>"
+            f"<published>{_isoformat(item['published'])}</published>"
+            f"<updated>{_isoformat(item['updated'] or item['published'])}</updated>"
+            f"<summary>{escape(item['summary'])}</summary>"
+            f"<content type=\"html\">{escape(item['content'])}</content>"
+            '</entry>'
+        ).encode('utf-8')
+    yield b'</feed>'
+
+
+# format name -> streaming writer, for full-content feeds
+STREAMING_FEED_FORMATS = {'rss': stream_rss, 'atom': stream_atom}
+
+
+# format name -> (renderer, mimetype)
+FEED_FORMATS = {
+    'rss': (render_rss, 'application/rss+xml'),
+    'atom': (render_atom, 'application/atom+xml'),
+    'json': (render_json, 'application/feed+json'),
+}
@@ -1,14 +1,41 @@
 """
 File Upload Utilities - Handle image uploads for blog posts
 """
+import hashlib
 import os
+import re
+import time
 import uuid
-from werkzeug.utils import secure_filename
-from flask import current_app
-from PIL import Image
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+from flask import current_app, request
+
+from .images import (
+    DEFAULT_VARIANT_WIDTHS, DEFAULT_MAX_PIXELS, FORMAT_EXTENSIONS,
+    read_header, write_manifest, read_manifest, manifest_path
+)
+from .image_queue import image_queue, process_upload
+from .thumbnails import thumbnail_cache
 
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+UPLOAD_URL_PREFIX = '/uploads/'
+INCOMING_FOLDER = '.incoming'  # Raw uploads waiting for processing
+DIGEST_LENGTH = 32  # Hex characters of the content hash used as filename
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Stored images and their variants, e.g. /uploads/posts/<digest>-640w.webp
+UPLOAD_REF_PATTERN = re.compile(r'/uploads/(?:[\w-]+/)*([0-9a-f]{%d})(?:-\d+w)?\.[a-z]+' % DIGEST_LENGTH)
+
+# Files named after an upload's digest: images, variants, manifests and raw copies
+HASHED_FILENAME_PATTERN = re.compile(r'([0-9a-f]{%d}(?:-\d+w)?)\.[a-z]+' % DIGEST_LENGTH)
+
+# Content-addressed images never change meaning once written (manifests do)
+HASHED_IMAGE_PATTERN = re.compile(
+    r'([0-9a-f]{%d}(?:-\d+w)?)\.(?:%s)' % (DIGEST_LENGTH, '|'.join(sorted(ALLOWED_EXTENSIONS)))
+)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
 
 
 def allowed_file(filename):
@@ -17,13 +44,145 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def save_image(file, subfolder='posts'):
+def upload_path(image_url):
+    """
+    Map a stored image URL (e.g. /uploads/posts/abc.jpg) to its file path.
+
+    Returns None for URLs outside the uploads folder.
+    """
+    if not image_url or not image_url.startswith(UPLOAD_URL_PREFIX):
+        return None
+
+    upload_folder = os.path.abspath(current_app.config.get('UPLOAD_FOLDER', 'uploads'))
+    path = os.path.abspath(os.path.join(upload_folder, image_url[len(UPLOAD_URL_PREFIX):]))
+    if not path.startswith(upload_folder + os.sep):
+        return None
+    return path
+
+
+def load_image_manifest(image_url):
+    """Variant manifest of an uploaded image, or None"""
+    path = upload_path(image_url)
+    return read_manifest(path) if path else None
+
+
+def image_references(*texts):
+    """
+    Digests of the uploads referenced by image URLs or HTML content.
+
+    Variant URLs count as references to their original image.
+    """
+    digests = set()
+    for text in texts:
+        if text:
+            digests.update(UPLOAD_REF_PATTERN.findall(text))
+    return digests
+
+
+def incoming_path(image_url):
+    """Path of the raw upload behind an image URL while it is being processed"""
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    return os.path.join(upload_folder, INCOMING_FOLDER, os.path.basename(image_url))
+
+
+def find_upload(filename):
+    """
+    Locate the file to serve for an /uploads/<filename> request.
+
+    Until processing finishes, the final image does not exist yet and the
+    raw upload is served in its place.
+
+    Returns:
+        tuple: (directory, filename, is_final)
+    """
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    if os.path.isfile(os.path.join(upload_folder, filename)):
+        return upload_folder, filename, True
+
+    raw_path = incoming_path(filename)
+    if os.path.isfile(raw_path):
+        return os.path.dirname(raw_path), os.path.basename(raw_path), False
+
+    return upload_folder, filename, True
+
+
+def send_upload(filename):
+    """
+    Build the response for an /uploads/<filename> request.
+
+    Hashed filenames get a year-long immutable Cache-Control and their
+    digest as a strong ETag. UPLOAD_SERVE_MODE selects who sends the bytes:
+
+    - direct: Werkzeug streams the file (wsgi.file_wrapper where the
+      server has one) and answers Range requests by seeking
+    - x-sendfile: an empty response with X-Sendfile (Apache, lighttpd)
+    - x-accel-redirect: an empty response with X-Accel-Redirect pointing
+      into UPLOAD_ACCEL_PREFIX, an nginx internal location aliased to
+      UPLOAD_FOLDER
+
+    In the offload modes the front server handles Range itself; the app
+    still answers conditional requests with 304 without touching the file.
+    Raw uploads still being processed are never cached. Sidecar manifests
+    are not served: their state comes from the upload status endpoint.
     """
-    Save uploaded image to local filesystem.
+    if filename.endswith('.json'):
+        raise NotFound()
+
+    directory, name, is_final = find_upload(filename)
+    path = safe_join(directory, name)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    config = current_app.config
+    mode = config.get('UPLOAD_SERVE_MODE', 'direct') if is_final else 'direct'
+    environ = request.environ
+    if mode != 'direct':
+        environ = {key: value for key, value in environ.items() if key != 'HTTP_RANGE'}
+
+    match = HASHED_IMAGE_PATTERN.fullmatch(os.path.basename(name))
+    immutable = is_final and match is not None
+
+    response = send_file(
+        path, environ,
+        etag=match.group(1) if immutable else True,
+        max_age=IMMUTABLE_MAX_AGE if immutable else config.get('UPLOAD_CACHE_MAX_AGE', 3600),
+        use_x_sendfile=mode != 'direct',
+        response_class=current_app.response_class
+    )
+
+    if mode == 'x-accel-redirect':
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = config.get('UPLOAD_ACCEL_PREFIX', '/protected-uploads/') + filename
+
+    if not is_final:
+        # Raw upload stands in until processing finishes
+        response.cache_control.no_store = True
+        response.cache_control.max_age = None
+    elif immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def save_image(file, subfolder='posts', on_ready=None):
+    """
+    Store an uploaded image and queue it for processing.
+
+    Files are named after the SHA-256 of their content, so the same image
+    uploaded twice is stored and processed once and its URL never changes
+    meaning. The extension comes from the detected image format, not the
+    client's filename. New content is streamed to disk and a 'processing' manifest
+    is written; decoding, resizing and encoding of the image and its
+    responsive variants (IMAGE_VARIANT_WIDTHS) happen in the background.
+    The returned URL is final and works immediately.
+
+    The upload is copied to disk in fixed-size chunks and only its header
+    is parsed here; images above IMAGE_MAX_PIXELS are rejected before
+    any pixels are decoded.
     
     Args:
         file: FileStorage object from request.files
         subfolder: Subdirectory within uploads folder
+        on_ready: Optional callback receiving the final manifest
     
     Returns:
         str: Relative path to saved image, or None if failed
@@ -35,54 +194,144 @@ def save_image(file, subfolder='posts'):
         return None
     
     try:
-        # Generate unique filename
-        original_filename = secure_filename(file.filename)
-        extension = original_filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{extension}"
-        
-        # Ensure upload directory exists
+        # Ensure upload directories exist
         upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
         subfolder_path = os.path.join(upload_folder, subfolder)
+        incoming_folder = os.path.join(upload_folder, INCOMING_FOLDER)
         os.makedirs(subfolder_path, exist_ok=True)
+        os.makedirs(incoming_folder, exist_ok=True)
         
-        # Save the file
-        filepath = os.path.join(subfolder_path, unique_filename)
+        # Stream the raw upload to disk, hashing it on the way
+        digest = hashlib.sha256()
+        part_path = os.path.join(incoming_folder, f"{uuid.uuid4().hex}.part")
+        with open(part_path, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
         
-        # Optionally resize/optimize image
-        image = Image.open(file)
+        max_pixels = current_app.config.get('IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+        try:
+            image_format, _, _ = read_header(part_path, max_pixels)
+        except Exception as e:
+            os.remove(part_path)
+            current_app.logger.warning(f"Rejected image upload: {e}")
+            return None
+        if image_format not in FORMAT_EXTENSIONS:
+            os.remove(part_path)
+            return None
         
-        # Convert RGBA to RGB if needed (for JPEG)
-        if image.mode == 'RGBA' and extension in ['jpg', 'jpeg']:
-            image = image.convert('RGB')
+        # Named after the detected format, so one digest always maps to one file
+        extension = FORMAT_EXTENSIONS[image_format]
+        unique_filename = f"{digest.hexdigest()[:DIGEST_LENGTH]}.{extension}"
+        image_url = f"/uploads/{subfolder}/{unique_filename}"
+        image_path = os.path.join(subfolder_path, unique_filename)
         
-        # Resize if too large (max 1920px width)
-        max_width = 1920
-        if image.width > max_width:
-            ratio = max_width / image.width
-            new_height = int(image.height * ratio)
-            image = image.resize((max_width, new_height), Image.Resampling.LANCZOS)
+        manifest = read_manifest(image_path)
+        if manifest and manifest.get('status') != 'failed':
+            # Same content is already stored or being processed, possibly
+            # under another extension by an older release
+            os.remove(part_path)
+            return manifest.get('src') or image_url
         
-        # Save with optimization
-        if extension in ['jpg', 'jpeg']:
-            image.save(filepath, 'JPEG', quality=85, optimize=True)
-        elif extension == 'png':
-            image.save(filepath, 'PNG', optimize=True)
-        elif extension == 'webp':
-            image.save(filepath, 'WEBP', quality=85)
-        else:
-            image.save(filepath)
+        raw_path = os.path.join(incoming_folder, unique_filename)
+        os.replace(part_path, raw_path)
+        write_manifest(image_path, {'src': image_url, 'status': 'processing'})
+        
+        widths = current_app.config.get('IMAGE_VARIANT_WIDTHS', DEFAULT_VARIANT_WIDTHS)
+        image_queue.submit(
+            (raw_path, image_path, extension, f"/uploads/{subfolder}", widths, max_pixels),
+            on_done=on_ready
+        )
         
         # Return relative path for storage in database
-        return f"/uploads/{subfolder}/{unique_filename}"
+        return image_url
     
     except Exception as e:
         print(f"Error saving image: {e}")
         return None
 
 
+def recover_uploads(stale_seconds, on_ready=None):
+    """
+    Finish uploads whose processing job was lost, e.g. to a worker restart.
+
+    A job that never completed leaves its manifest at 'processing' and
+    its raw file in INCOMING_FOLDER. Manifests untouched for longer than
+    stale_seconds are processed again inline from the raw file, or marked
+    failed when the raw file is gone, so posts fall back to the original
+    image instead of waiting forever. Abandoned partial uploads older than
+    stale_seconds are removed.
+
+    Args:
+        stale_seconds: Leave jobs younger than this to the running workers
+        on_ready: Optional callback receiving each final manifest
+
+    Returns:
+        dict: Counts of 'processed', 'failed' and 'removed_parts', and the
+        'urls' of the recovered images
+    """
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    incoming_folder = os.path.join(upload_folder, INCOMING_FOLDER)
+    cutoff = time.time() - stale_seconds
+    widths = current_app.config.get('IMAGE_VARIANT_WIDTHS', DEFAULT_VARIANT_WIDTHS)
+    max_pixels = current_app.config.get('IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+    report = {'processed': 0, 'failed': 0, 'removed_parts': 0, 'urls': []}
+
+    stale = []
+    for root, dirs, files in os.walk(upload_folder):
+        # Skip INCOMING_FOLDER and the thumbnail cache
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            manifest = read_manifest(path)
+            if manifest and manifest.get('status') == 'processing' and manifest.get('src'):
+                stale.append(manifest['src'])
+
+    for image_url in stale:
+        image_path = upload_path(image_url)
+        if not image_path:
+            continue
+        raw_path = incoming_path(image_url)
+        url_prefix, filename = image_url.rsplit('/', 1)
+        if os.path.isfile(raw_path):
+            manifest = process_upload(
+                raw_path, image_path, filename.rsplit('.', 1)[1], url_prefix, widths, max_pixels
+            )
+        else:
+            manifest = {'src': image_url, 'status': 'failed', 'error': 'Raw upload lost before processing'}
+            write_manifest(image_path, manifest)
+
+        report['processed' if manifest['status'] == 'ready' else 'failed'] += 1
+        report['urls'].append(image_url)
+        if on_ready:
+            on_ready(manifest)
+
+    if os.path.isdir(incoming_folder):
+        for name in os.listdir(incoming_folder):
+            path = os.path.join(incoming_folder, name)
+            try:
+                if name.endswith('.part') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    report['removed_parts'] += 1
+            except OSError:
+                pass
+
+    return report
+
+
 def delete_image(image_path):
     """
-    Delete an image from the filesystem.
+    Delete an image, its variants and its manifest from the filesystem.
+
+    Uploads are shared between posts: call this only once the image's
+    last reference is gone (see PostService).
     
     Args:
         image_path: Relative path stored in database (e.g., /uploads/posts/abc.jpg)
@@ -90,20 +339,22 @@ def delete_image(image_path):
     Returns:
         bool: True if deleted successfully
     """
-    if not image_path:
+    absolute_path = upload_path(image_path)
+    if not absolute_path:
         return False
     
     try:
-        # Convert relative path to absolute
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        # Remove leading /uploads/ from path
-        relative_path = image_path.lstrip('/uploads/')
-        absolute_path = os.path.join(upload_folder, relative_path)
+        manifest = read_manifest(absolute_path) or {}
+        paths = [upload_path(variant['url']) for variant in manifest.get('variants', [])]
+        paths += [manifest_path(absolute_path), absolute_path, incoming_path(image_path)]
+        thumbnail_cache.remove(image_path[len(UPLOAD_URL_PREFIX):])
         
-        if os.path.exists(absolute_path):
-            os.remove(absolute_path)
-            return True
-        return False
+        deleted = False
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+                deleted = True
+        return deleted
     
     except Exception as e:
         print(f"Error deleting image: {e}")
@@ -0,0 +1,196 @@
+"""
+Content Fingerprinting - Detect duplicate and near-duplicate comment text
+
+Each text is reduced to a set of lookup keys:
+- an author key, the SHA-256 of the author and the normalized text
+- an exact key, the SHA-256 of the normalized text
+- a few near-duplicate keys, the LSH bands of a MinHash signature
+
+Two texts with high shingle overlap share at least one band key with
+high probability, so all checks are plain key lookups. Short stock
+phrases ("Thanks for sharing!") are legitimately repeated by different
+people, so texts below a minimum length only get the author key.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+
+SHINGLE_SIZE = 4
+LSH_BANDS = 10
+LSH_ROWS = 3
+
+# Near-duplicate keys are unreliable for very short texts, so they are
+# only produced once a comment has this many words
+MIN_NEAR_DUPLICATE_WORDS = 4
+
+AUTHOR_PREFIX = 'a:'
+EXACT_PREFIX = 'h:'
+BAND_PREFIX = 'b:'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # Fixed seed keeps keys stable across processes and restarts
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(LSH_BANDS * LSH_ROWS)
+]
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class Fingerprint(namedtuple('Fingerprint', ['exact_key', 'band_keys', 'author_key'])):
+    """Lookup keys of a text; exact_key is None for texts matched per author only"""
+
+    __slots__ = ()
+
+    @property
+    def keys(self):
+        return tuple(key for key in (self.author_key, self.exact_key, *self.band_keys) if key)
+
+
+def normalize_content(text):
+    """Lowercase, strip markup and punctuation, and collapse whitespace"""
+    text = _TAG_RE.sub(' ', text or '')
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def shingles(normalized, size=SHINGLE_SIZE):
+    """Set of overlapping character n-grams of a normalized text"""
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def minhash(features):
+    """MinHash signature of a feature set, one value per permutation"""
+    hashes = [_hash64(feature) for feature in features]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def fingerprint(text, author=None, min_length=0):
+    """
+    Build the lookup keys of a text.
+
+    Args:
+        text: Comment content
+        author: Stable author identity (user id or guest email) for the author key
+        min_length: Normalized length below which only the author key is built
+    """
+    normalized = normalize_content(text)
+    author_key = None
+    if author is not None:
+        author_key = AUTHOR_PREFIX + hashlib.sha256(f'{author}\0{normalized}'.encode('utf-8')).hexdigest()
+
+    if len(normalized) < min_length:
+        return Fingerprint(exact_key=None, band_keys=(), author_key=author_key)
+
+    exact_key = EXACT_PREFIX + hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    if len(normalized.split()) < MIN_NEAR_DUPLICATE_WORDS:
+        return Fingerprint(exact_key=exact_key, band_keys=(), author_key=author_key)
+
+    signature = minhash(shingles(normalized))
+    band_keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(f'{band}:{rows}'.encode('utf-8'), digest_size=12).hexdigest()
+        band_keys.append(BAND_PREFIX + digest)
+
+    return Fingerprint(exact_key=exact_key, band_keys=tuple(band_keys), author_key=author_key)
+
+
+def classify_match(fp, seen_keys):
+    """
+    Classify a fingerprint against a collection of already seen keys.
+
+    Returns:
+        str: 'duplicate', 'near_duplicate' or None
+    """
+    if fp.author_key in seen_keys or fp.exact_key in seen_keys:
+        return 'duplicate'
+    if any(key in seen_keys for key in fp.band_keys):
+        return 'near_duplicate'
+    return None
+
+
+class RecentFingerprintWindow:
+    """
+    Bounded, time-limited in-memory set of recently seen fingerprint keys.
+
+    Fingerprints are recorded per comment id so that edited and deleted
+    comments can be dropped before they expire.
+    """
+
+    def __init__(self, max_size=10000, ttl=24 * 60 * 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = deque()
+        self._comments = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def match(self, fp):
+        """
+        Look up a fingerprint.
+
+        Returns:
+            str: 'duplicate', 'near_duplicate' or None
+        """
+        with self._lock:
+            self._evict(time.monotonic())
+            return classify_match(fp, self._keys)
+
+    def add(self, comment_id, fp):
+        """Record the fingerprint of a comment, replacing any previous one"""
+        with self._lock:
+            now = time.monotonic()
+            self._forget(comment_id)
+            entry = (now, comment_id, fp)
+            self._entries.append(entry)
+            self._comments[comment_id] = entry
+            for key in fp.keys:
+                self._keys[key] = self._keys.get(key, 0) + 1
+            self._evict(now)
+
+    def discard(self, comment_id):
+        """Drop the fingerprint of an edited or deleted comment"""
+        with self._lock:
+            self._forget(comment_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._comments.clear()
+            self._keys.clear()
+
+    def __len__(self):
+        return len(self._comments)
+
+    def _forget(self, comment_id):
+        # The deque entry stays until it expires; eviction skips it
+        entry = self._comments.pop(comment_id, None)
+        if entry is None:
+            return
+        for key in entry[2].keys:
+            remaining = self._keys.get(key, 0) - 1
+            if remaining > 0:
+                self._keys[key] = remaining
+            else:
+                self._keys.pop(key, None)
+
+    def _evict(self, now):
+        cutoff = now - self.ttl
+        while self._entries and (len(self._comments) > self.max_size or self._entries[0][0] < cutoff):
+            entry = self._entries.popleft()
+            if self._comments.get(entry[1]) is entry:
+                self._forget(entry[1])
@@ -0,0 +1,103 @@
+"""
+Image Processing Queue - Decode, resize and encode uploads off the request path
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+
+def process_upload(raw_path, image_path, extension, url_prefix, widths, max_pixels):
+    """
+    Turn a stored raw upload into the final image, variants and manifest.
+
+    Runs in a pool worker, so it only takes plain arguments and never
+    touches the app or database.
+
+    Returns:
+        dict: Final manifest ('status' is 'ready' or 'failed')
+    """
+    from .images import open_image, process_image, write_manifest
+
+    dest_dir = os.path.dirname(image_path)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    try:
+        with open_image(raw_path, max(widths), max_pixels) as image:
+            manifest = process_image(image, dest_dir, stem, extension, url_prefix, widths)
+        manifest['status'] = 'ready'
+    except Exception as e:
+        manifest = {'src': f'{url_prefix}/{stem}.{extension}', 'status': 'failed', 'error': str(e)}
+
+    write_manifest(image_path, manifest)
+    try:
+        os.remove(raw_path)
+    except OSError:
+        pass
+    return manifest
+
+
+class ImageProcessingQueue:
+    """
+    Process pool for upload processing.
+
+    With IMAGE_PROCESSING_WORKERS = 0 jobs run inline, which keeps tests
+    and single-process tools deterministic.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        workers = current_app.config.get('IMAGE_PROCESSING_WORKERS', 0)
+        if workers <= 0:
+            return None
+
+        with self._lock:
+            # Pools do not survive a fork, so each worker process builds its own
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, job_args, on_done=None):
+        """
+        Queue a process_upload job.
+
+        Args:
+            job_args: Positional arguments for process_upload
+            on_done: Called with the final manifest inside an app context
+
+        Returns:
+            dict: The manifest if the job ran inline, otherwise None
+        """
+        executor = self._get_executor()
+        if executor is None:
+            manifest = process_upload(*job_args)
+            if on_done:
+                on_done(manifest)
+            return manifest
+
+        app = current_app._get_current_object()
+        future = executor.submit(process_upload, *job_args)
+
+        def callback(done_future):
+            try:
+                manifest = done_future.result()
+            except Exception as e:
+                app.logger.error(f'Image processing failed: {e}')
+                return
+            if on_done:
+                with app.app_context():
+                    try:
+                        on_done(manifest)
+                    except Exception as e:
+                        app.logger.error(f'Image processing callback failed: {e}')
+
+        future.add_done_callback(callback)
+        return None
+
+
+image_queue = ImageProcessingQueue()
@@ -0,0 +1,232 @@
+"""
+Image Processing - Responsive variants and manifests for uploaded images
+
+Pillow is imported inside the functions that need it, keeping it out of
+app startup; it loads on the first upload or thumbnail.
+"""
+import base64
+import io
+import json
+import os
+
+
+DEFAULT_VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+DEFAULT_MAX_PIXELS = 40_000_000  # ~160MB as RGBA once decoded
+PLACEHOLDER_SIZE = 20  # Longest side of the inline placeholder, in pixels
+
+PIL_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP', 'gif': 'GIF'}
+# Extension uploads of each format are stored under, whatever the client called them
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+    'GIF': {},
+}
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an image's declared dimensions exceed the pixel limit"""
+
+
+def read_header(path, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Read an image's format and size without decoding its pixels.
+
+    Raises:
+        ImageTooLarge: If width * height exceeds max_pixels
+        PIL.UnidentifiedImageError: If the file is not a supported image
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        width, height = image.size
+        image_format = image.format
+
+    if width * height > max_pixels:
+        raise ImageTooLarge(f'Image is {width}x{height}, above the {max_pixels} pixel limit')
+    return image_format, width, height
+
+
+def open_image(path, max_width, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Open an image for processing with bounded decode memory.
+
+    Dimensions are checked from the header before any pixel data is
+    read. JPEGs larger than max_width are decoded in draft mode, letting
+    libjpeg downscale by 1/2, 1/4 or 1/8 while decoding so the full
+    resolution buffer is never allocated.
+    """
+    from PIL import Image
+
+    read_header(path, max_pixels)
+
+    image = Image.open(path)
+    if image.format == 'JPEG' and image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image.draft(image.mode, (max_width, height))
+    return image
+
+
+def _save(image, path, pil_format):
+    options = dict(SAVE_OPTIONS.get(pil_format, {}))
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if pil_format == 'GIF' and getattr(image, 'is_animated', False):
+        options['save_all'] = True
+    image.save(path, pil_format, **options)
+
+
+def _resize_to_width(image, width):
+    from PIL import Image
+
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def process_image(image, dest_dir, stem, extension, url_prefix, widths=DEFAULT_VARIANT_WIDTHS):
+    """
+    Write the main image and its responsive variants.
+
+    The main image is capped at the largest configured width. Every width
+    up to the main image's own width gets a WebP variant and one in the
+    original format. Animated GIFs are kept as a single file since
+    resizing would drop their frames.
+
+    Args:
+        image: Opened PIL image
+        dest_dir: Directory receiving the files
+        stem: Base filename without extension
+        extension: Original file extension (lowercase)
+        url_prefix: Public URL of dest_dir (e.g. /uploads/posts)
+        widths: Variant width ladder
+
+    Returns:
+        dict: Manifest describing the main image and its variants
+    """
+    pil_format = PIL_FORMATS[extension]
+    widths = sorted(set(widths))
+    max_width = widths[-1]
+
+    if image.mode in ('P', 'LA') and pil_format != 'GIF':
+        image = image.convert('RGBA')
+
+    if image.width > max_width and not getattr(image, 'is_animated', False):
+        image = _resize_to_width(image, max_width)
+
+    main_name = f'{stem}.{extension}'
+    _save(image, os.path.join(dest_dir, main_name), pil_format)
+
+    manifest = {
+        'src': f'{url_prefix}/{main_name}',
+        'width': image.width,
+        'height': image.height,
+        'format': pil_format.lower(),
+        'variants': []
+    }
+
+    if pil_format == 'GIF':
+        manifest['placeholder'] = build_placeholder(image)
+        return manifest
+
+    # Resize from the previous (larger) step: cheaper than from the full image
+    source = image
+    for width in reversed([w for w in widths if w <= image.width]):
+        resized = source if width == source.width else _resize_to_width(source, width)
+        for variant_format in dict.fromkeys(('WEBP', pil_format)):
+            variant_ext = 'webp' if variant_format == 'WEBP' else extension
+            name = f'{stem}-{width}w.{variant_ext}'
+            _save(resized, os.path.join(dest_dir, name), variant_format)
+            manifest['variants'].append({
+                'url': f'{url_prefix}/{name}',
+                'width': resized.width,
+                'height': resized.height,
+                'format': variant_format.lower()
+            })
+        source = resized
+
+    manifest['variants'].sort(key=lambda v: (v['format'], v['width']))
+    # The smallest step is the cheapest input for the placeholder
+    manifest['placeholder'] = build_placeholder(source)
+    return manifest
+
+
+def build_placeholder(image):
+    """
+    Tiny inline preview of an image for rendering before it loads.
+
+    Returns:
+        dict: {'data_uri': base64 WebP at most PLACEHOLDER_SIZE px wide/high,
+               'color': dominant color as #rrggbb}
+    """
+    from PIL import Image
+
+    small = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.BILINEAR)
+
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=40)
+    data_uri = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    # Most common color among a few quantized buckets
+    palette_image = small.convert('RGB').quantize(colors=4)
+    _, index = max(palette_image.getcolors())
+    red, green, blue = palette_image.getpalette()[index * 3:index * 3 + 3]
+
+    return {'data_uri': data_uri, 'color': f'#{red:02x}{green:02x}{blue:02x}'}
+
+
+def render_thumbnail(source_path, dest_path, width, height, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Write a width x height center-cropped copy of an image.
+
+    JPEG sources are decoded in draft mode at the smallest scale that
+    still covers the target box. The file is written to a temporary name
+    and renamed, so readers never see a partial thumbnail.
+    """
+    from PIL import Image, ImageOps
+
+    read_header(source_path, max_pixels)
+
+    with Image.open(source_path) as image:
+        if image.format == 'JPEG':
+            image.draft(image.mode, (width, height))
+        pil_format = image.format
+        if image.mode in ('P', 'LA'):
+            image = image.convert('RGBA')
+        thumbnail = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+
+    tmp_path = f'{dest_path}.{os.getpid()}.tmp'
+    _save(thumbnail, tmp_path, pil_format)
+    os.replace(tmp_path, dest_path)
+
+
+def manifest_path(image_path):
+    """Sidecar manifest path for an image file path"""
+    return os.path.splitext(image_path)[0] + '.json'
+
+
+def write_manifest(image_path, manifest):
+    path = manifest_path(image_path)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(image_path):
+    """Load the sidecar manifest of an image, or None if it has none"""
+    try:
+        with open(manifest_path(image_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_srcset(variants):
+    """Group variants into srcset strings keyed by format"""
+    srcset = {}
+    for variant in sorted(variants or [], key=lambda v: v['width']):
+        srcset.setdefault(variant['format'], []).append(f"{variant['url']} {variant['width']}w")
+    return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
@@ -2,40 +2,110 @@
 JWT Utilities - Authentication decorators and helpers
 """
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask import jsonify, g, current_app, has_app_context
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
 from ..models import User
+from .cache import TTLCache
+
+
+# Column snapshots of recently resolved users, shared by requests in this process
+_user_cache = TTLCache(maxsize=2048, ttl=30, name='users')
+
+
+def load_user(user_id):
+    """
+    Resolve a user at most once per request.
+
+    Lookup order is flask.g, then the short-lived process cache, then the
+    database. Cached users are merged into the current session without a
+    query, so callers get a normal attached instance.
+    """
+    if isinstance(user_id, str):
+        user_id = int(user_id)
+
+    if g.get('_current_user_id') == user_id:
+        return g._current_user
+
+    user = _load_user_cached(user_id)
+    g._current_user_id = user_id
+    g._current_user = user
+    return user
+
+
+def _load_user_cached(user_id):
+    from ..extensions import db
+
+    ttl = current_app.config.get('USER_CACHE_TTL', 30)
+    if ttl > 0:
+        state = _user_cache.get(user_id)
+        if state is not None:
+            user = User(**state)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+    # Use db.session.get for better type handling in SQLA 2.0
+    user = db.session.get(User, user_id)
+
+    if user is not None and ttl > 0:
+        state = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        _user_cache.set(user_id, state, ttl)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """Drop a user from this process's cache (and the current request)"""
+    _user_cache.delete(int(user_id))
+    if has_app_context() and g.get('_current_user_id') == int(user_id):
+        g.pop('_current_user_id', None)
+        g.pop('_current_user', None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    # Role changes, password changes and deletions must not be served stale
+    _user_cache.delete(target.id)
+
+
+def token_claims(user):
+    """Additional JWT claims that let routes authorize without loading the user"""
+    return {
+        'role': 'admin' if user.is_admin else 'user',
+        'ver': user.token_version or 0
+    }
 
 
 def admin_required(fn):
     """
     Decorator to require admin authentication for routes.
     Uses IoC principle by depending on abstraction (JWT) rather than concrete session.
+
+    Authorization comes from the verified token's role claim; revoked
+    tokens are already rejected during verification.
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-
-            # Convert to integer if string
-            if isinstance(current_user_id, str):
-                current_user_id = int(current_user_id)
+            role = get_jwt().get('role')
 
-            # Use db.session.get for better type handling in SQLA 2.0
-            from ..extensions import db
-            user = db.session.get(User, current_user_id)
+            if role is None:
+                # Token issued before role claims existed
+                user = load_user(get_jwt_identity())
+                if not user:
+                    return jsonify({'error': 'User not found'}), 404
+                role = 'admin' if user.is_admin else 'user'
 
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-
-            if not user.is_admin:
+            if role != 'admin':
                 return jsonify({'error': 'Admin access required'}), 403
-
-            return fn(*args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Authentication required', 'message': str(e)}), 401
 
+        # Outside the try: errors of the view itself are not authentication failures
+        return fn(*args, **kwargs)
+
     return wrapper
 
 
@@ -48,34 +118,23 @@ def user_required(fn):
     def wrapper(*args, **kwargs):
         try:
             verify_jwt_in_request()
-            current_user_id = get_jwt_identity()
-
-            # Convert to integer if string
-            if isinstance(current_user_id, str):
-                current_user_id = int(current_user_id)
 
-            # Use db.session.get for better type handling in SQLA 2.0
-            from ..extensions import db
-            user = db.session.get(User, current_user_id)
-
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-
-            return fn(*args, **kwargs)
+            if 'role' not in get_jwt():
+                # Token issued before role claims existed
+                if not load_user(get_jwt_identity()):
+                    return jsonify({'error': 'User not found'}), 404
         except Exception as e:
             return jsonify({'error': 'Authentication required', 'message': str(e)}), 401
 
+        return fn(*args, **kwargs)
+
     return wrapper
 
 
 def get_current_admin():
     """Get the current authenticated admin user"""
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        from ..extensions import db
-        return db.session.get(User, current_user_id)
+        return load_user(get_jwt_identity())
     except:
         return None
 
@@ -83,10 +142,6 @@ def get_current_admin():
 def get_current_user():
     """Get the current authenticated user (admin or regular user)"""
     try:
-        current_user_id = get_jwt_identity()
-        if isinstance(current_user_id, str):
-            current_user_id = int(current_user_id)
-        from ..extensions import db
-        return db.session.get(User, current_user_id)
+        return load_user(get_jwt_identity())
     except:
         return None
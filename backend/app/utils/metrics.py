@@ -0,0 +1,374 @@
+"""
+Metrics - Per-route latency, status codes, SQL work and cache hits in Prometheus format
+
+Every worker process counts on its own. With METRICS_DIR set, workers
+write their counters there as one snapshot file per process (at most
+every METRICS_FLUSH_INTERVAL seconds, and at exit) and /api/metrics sums
+the snapshots of all workers, so whichever worker answers the scrape
+reports the whole server. Scrapes fold the snapshots of exited workers
+into one archive file, so totals never go backwards and the directory
+does not grow with every restart. Workers are told apart by pid, so
+METRICS_DIR must not be shared between hosts.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .cache import cache_stats
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots of exited workers are kept
+    fcntl = None
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status code', None),
+    'http_request_duration_seconds': ('histogram', 'Time to build the response by route', LATENCY_BUCKETS),
+    'db_queries_total': ('counter', 'SQL statements executed by route', None),
+    'db_query_duration_seconds_total': ('counter', 'Time spent executing SQL by route', None),
+    'db_queries_per_request': ('histogram', 'SQL statements per request by route', QUERY_COUNT_BUCKETS),
+    'cache_hits_total': ('counter', 'In-process cache hits', None),
+    'cache_misses_total': ('counter', 'In-process cache misses, including expired entries', None),
+}
+
+SNAPSHOT_PATTERN = re.compile(r'metrics-(\d+)-\d+\.json')
+ARCHIVE_FILE = 'metrics-archive.json'  # Summed snapshots of exited workers
+LOCK_FILE = 'metrics.lock'
+ARCHIVED_KEY = 'archived'  # Snapshot files already in the archive, until removed
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms of this process.
+
+    Values are keyed by metric name and a tuple of (label, value) pairs.
+    Histograms hold per-bucket counts (the last one for +Inf) and a sum.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._started = None
+        self._last_flush = 0.0
+
+    def _process_values(self):
+        # A forked worker starts from zero instead of the parent's counts
+        if self._pid != os.getpid():
+            self._values = {}
+            self._pid = os.getpid()
+            self._started = time.time()
+        return self._values
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            series = self._process_values().setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self._lock:
+            series = self._process_values().setdefault(name, {})
+            counts, total = series.get(labels) or ([0] * (len(buckets) + 1), 0)
+            counts[bisect_left(buckets, value)] += 1
+            series[labels] = [counts, total + value]
+
+    def snapshot(self):
+        """This process's values, cache counters included, as JSON-ready data"""
+        with self._lock:
+            values = {
+                name: [[list(labels), _copy(value)] for labels, value in series.items()]
+                for name, series in self._process_values().items()
+            }
+        for cache, (hits, misses) in cache_stats().items():
+            labels = [['cache', cache]]
+            values.setdefault('cache_hits_total', []).append([labels, hits])
+            values.setdefault('cache_misses_total', []).append([labels, misses])
+        return values
+
+    # ---- Multi-process aggregation ---- #
+
+    def flush(self, directory):
+        """Write this process's snapshot into directory"""
+        self._process_values()
+        path = os.path.join(directory, f'metrics-{self._pid}-{int(self._started * 1000)}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        if time.monotonic() - self._last_flush >= interval:
+            try:
+                self.flush(directory)
+            except OSError as e:
+                current_app.logger.warning(f'Could not write metrics snapshot: {e}')
+
+    def collect(self, directory=None):
+        """
+        Sum the snapshots of every process writing to directory (or only
+        this process's values without one).
+
+        Returns:
+            dict: name -> {labels tuple: value}
+        """
+        if not directory:
+            return _merge({}, self.snapshot())
+
+        self.flush(directory)
+        self.compact(directory)
+        merged = {}
+        with _directory_lock(directory, shared=True):
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                snapshot = _load_snapshot(path)
+                if snapshot is not None:
+                    _merge(merged, snapshot)
+        return merged
+
+    def compact(self, directory):
+        """
+        Fold the snapshots of exited processes into ARCHIVE_FILE.
+
+        Runs under an exclusive lock on the directory, while collect reads
+        under a shared one, so a scrape never counts a snapshot both on
+        its own and in the archive. The archive lists the snapshots it
+        holds until they are removed, so a crash in between does not count
+        them twice.
+
+        Returns:
+            int: Number of snapshots removed
+        """
+        if fcntl is None:
+            return 0
+        exited = [path for path in glob.glob(os.path.join(directory, 'metrics-*.json'))
+                  if _exited(os.path.basename(path))]
+        if not exited:
+            return 0
+
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        with _directory_lock(directory, shared=False):
+            archive = _load_snapshot(archive_path) or {}
+            archived = {name for name in archive.pop(ARCHIVED_KEY, [])
+                        if os.path.exists(os.path.join(directory, name))}
+            merged = _merge({}, archive)
+            for path in exited:
+                name = os.path.basename(path)
+                if name in archived:
+                    continue
+                snapshot = _load_snapshot(path)
+                if snapshot is not None:
+                    _merge(merged, snapshot)
+                    archived.add(name)
+
+            archive = {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in merged.items()
+            }
+            archive[ARCHIVED_KEY] = sorted(archived)
+            tmp_path = f'{archive_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(archive, f)
+            os.replace(tmp_path, archive_path)
+
+            removed = 0
+            for name in archived:
+                try:
+                    os.remove(os.path.join(directory, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def render(self, directory=None):
+        """Prometheus text exposition of collect()"""
+        merged = self.collect(directory)
+        lines = []
+        for name, (metric_type, help_text, buckets) in METRICS.items():
+            series = merged.get(name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in sorted(series.items()):
+                if metric_type == 'counter':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+                    continue
+
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), counts):
+                    cumulative += count
+                    bucket_labels = labels + (('le', _format_number(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(merged, snapshot):
+    """Add a snapshot's values into merged (name -> {labels tuple: value})"""
+    for name, entries in snapshot.items():
+        if name not in METRICS:
+            continue
+        series = merged.setdefault(name, {})
+        for labels, value in entries:
+            labels = tuple(tuple(pair) for pair in labels)
+            series[labels] = _add(series.get(labels), value)
+    return merged
+
+
+def _load_snapshot(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _exited(filename):
+    """Whether the process that wrote a snapshot file is gone"""
+    match = SNAPSHOT_PATTERN.fullmatch(filename)
+    if not match:
+        return False
+    try:
+        os.kill(int(match.group(1)), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+@contextmanager
+def _directory_lock(directory, shared):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _copy(value):
+    return [list(value[0]), value[1]] if isinstance(value, list) else value
+
+
+def _add(current, value):
+    if current is None:
+        return _copy(value)
+    if isinstance(value, list):
+        return [[a + b for a, b in zip(current[0], value[0])], current[1] + value[1]]
+    return current + value
+
+
+def _format_number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+metrics = MetricsRegistry()
+
+
+def scrape_allowed():
+    """
+    Whether the current request may read /api/metrics.
+
+    Per-route latency and SQL counts are not for the public: scrapers send
+    METRICS_TOKEN as a bearer token, or without one configured must
+    connect from the loopback interface (e.g. a local Prometheus agent).
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+# ---- Instrumentation ---- #
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+
+def init_metrics(app):
+    """
+    Record every request of the app.
+
+    Latency is measured until the view returns, so streamed responses
+    count the time to their first byte.
+    """
+    directory = app.config.get('METRICS_DIR')
+    interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(lambda: metrics.flush(directory))
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics_start = time.perf_counter()
+        g._sql_queries = 0
+        g._sql_seconds = 0.0
+
+    @app.after_request
+    def _record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+
+        route = (('route', _route_label()),)
+        status_labels = (('method', request.method),) + route + (('status', str(response.status_code)),)
+        metrics.inc('http_requests_total', status_labels)
+        metrics.observe('http_request_duration_seconds', route, time.perf_counter() - start)
+        metrics.inc('db_queries_total', route, g._sql_queries)
+        metrics.inc('db_query_duration_seconds_total', route, g._sql_seconds)
+        metrics.observe('db_queries_per_request', route, g._sql_queries)
+
+        if directory:
+            metrics.maybe_flush(directory, interval)
+        return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_query_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop('_query_start', None)
+    if start is None or not has_request_context() or '_sql_queries' not in g:
+        return
+    g._sql_queries += 1
+    g._sql_seconds += time.perf_counter() - start
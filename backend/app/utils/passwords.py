@@ -0,0 +1,125 @@
+"""
+Password Hashing - Bounded worker pool for password hashing
+
+Hashing and verification run in a process pool so that a burst of
+logins cannot pin every request thread's CPU. The pool is created
+lazily in each worker process and admits a bounded number of jobs;
+beyond that, callers wait briefly and then get PasswordHasherBusy.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool has no free slot within the queue timeout"""
+
+
+class PasswordHasher:
+    """Configurable password hashing backed by an optional process pool"""
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._prefixes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def method(self):
+        return current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """
+        Hash a batch of passwords in parallel across the pool.
+
+        Every hash takes its own queue slot, like an interactive job, and
+        at most half the workers' worth of batch jobs are in flight at
+        once, so logins keep the rest of the pool during an import.
+        """
+        passwords = list(passwords)
+        method = self.method
+        executor = self._get_executor()
+        if executor is None:
+            return [generate_password_hash(password, method) for password in passwords]
+
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS', 1)
+        in_flight = threading.BoundedSemaphore(max(1, workers // 2))
+
+        def release(_future):
+            self._slots.release()
+            in_flight.release()
+
+        futures = []
+        for password in passwords:
+            in_flight.acquire()
+            try:
+                self._acquire_slot()
+            except Exception:
+                in_flight.release()
+                raise
+            try:
+                future = executor.submit(generate_password_hash, password, method)
+            except Exception:
+                release(None)
+                raise
+            future.add_done_callback(release)
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with a different method or cost"""
+        return password_hash.split('$', 1)[0] != self._method_prefix(self.method)
+
+    def _method_prefix(self, method):
+        # Werkzeug expands defaults into the stored prefix (e.g. 'scrypt' is
+        # stored as 'scrypt:32768:8:1'), so learn it from one real hash
+        prefix = self._prefixes.get(method)
+        if prefix is None:
+            prefix = self._run(generate_password_hash, '', method).split('$', 1)[0]
+            self._prefixes[method] = prefix
+        return prefix
+
+    def _get_executor(self):
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+        if workers <= 0:
+            return None
+
+        with self._lock:
+            # Pools do not survive a fork, so each worker process builds its own
+            if self._executor is None or self._pid != os.getpid():
+                max_pending = current_app.config.get('PASSWORD_HASH_MAX_PENDING', 32)
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                self._slots = threading.BoundedSemaphore(workers + max_pending)
+                self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        executor = self._get_executor()
+        if executor is None:
+            return fn(*args)
+
+        self._acquire_slot()
+        try:
+            return executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _acquire_slot(self):
+        timeout = current_app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+        if not self._slots.acquire(timeout=timeout):
+            raise PasswordHasherBusy('Password hashing queue is full')
+
+
+password_hasher = PasswordHasher()
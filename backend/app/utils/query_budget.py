@@ -0,0 +1,164 @@
+"""
+Query Budgets - Count SQL statements per block or request to catch N+1 patterns
+
+Routes declare how many statements they may run with @query_budget(n).
+A list endpoint that queries once per row outgrows its budget as soon
+as the page fills up, so budgets are checked against a seeded dataset:
+with `flask query-budgets`, with the fixtures in app.testing, and, when
+QUERY_BUDGETS_ENABLED is set (development), on every request, which also
+gets an X-Query-Count header.
+"""
+import os
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
+
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Counters of the enclosing count_queries blocks
+_active_counters = ContextVar('query_counters', default=())
+
+
+class QueryCounter:
+    """
+    SQL statements executed inside a count_queries block.
+
+    With a limit, the app frames of the call stack of the first
+    statement past it are kept in offending_stack.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.count = 0
+        self.statements = []
+        self.offending_stack = None
+
+    @property
+    def exceeded(self):
+        return self.limit is not None and self.count > self.limit
+
+    def _record(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+        if self.exceeded and self.offending_stack is None:
+            frames = [
+                frame for frame in traceback.extract_stack()
+                if frame.filename.startswith(APP_ROOT) and frame.filename != __file__
+            ]
+            self.offending_stack = ''.join(traceback.format_list(frames))
+
+
+@contextmanager
+def count_queries(limit=None):
+    """
+    Count the SQL statements run in the block, nested blocks included.
+
+        with count_queries() as queries:
+            client.get('/api/posts')
+        assert queries.count <= 5, queries.statements
+    """
+    counter = QueryCounter(limit)
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters.get():
+        counter._record(statement)
+
+
+def query_budget(limit):
+    """
+    Route decorator declaring the most SQL statements a request may run.
+
+    Only recorded on the view (outer decorators using functools.wraps
+    carry it along); nothing is checked in production.
+    """
+    def decorator(fn):
+        fn.query_budget = limit
+        return fn
+    return decorator
+
+
+def route_budget(app, path, method='GET'):
+    """Budget declared by the view serving path, or None"""
+    adapter = app.url_map.bind('localhost')
+    try:
+        endpoint, _ = adapter.match(path.split('?', 1)[0], method)
+    except HTTPException:
+        return None
+    return getattr(app.view_functions.get(endpoint), 'query_budget', None)
+
+
+def check_budgets(app, paths, headers=None):
+    """
+    Request paths with a test client and compare their query counts to
+    the route budgets.
+
+    Returns:
+        list: (path, status code, budget, QueryCounter) per path
+    """
+    client = app.test_client()
+    results = []
+    for path in paths:
+        budget = route_budget(app, path)
+        with count_queries(budget) as queries:
+            response = client.get(path, headers=headers)
+        results.append((path, response.status_code, budget, queries))
+    return results
+
+
+def budgeted_paths(app):
+    """GET routes with a budget that take no URL arguments"""
+    return sorted(
+        rule.rule for rule in app.url_map.iter_rules()
+        if 'GET' in rule.methods and not rule.arguments
+        and getattr(app.view_functions.get(rule.endpoint), 'query_budget', None) is not None
+    )
+
+
+def init_query_budgets(app):
+    """
+    Count the statements of every request (development).
+
+    Responses carry X-Query-Count; a request over its route's budget logs
+    a warning with the statements and the stack of the first one over.
+    """
+    @app.before_request
+    def _start_query_count():
+        view = current_app.view_functions.get(request.endpoint)
+        counter = QueryCounter(getattr(view, 'query_budget', None))
+        g._query_counter = counter
+        _active_counters.set(_active_counters.get() + (counter,))
+
+    @app.after_request
+    def _check_query_budget(response):
+        counter = g.get('_query_counter')
+        if counter is None:
+            return response
+
+        response.headers['X-Query-Count'] = str(counter.count)
+        if counter.exceeded:
+            statements = '\n'.join(f"  {' '.join(statement.split())}" for statement in counter.statements)
+            current_app.logger.warning(
+                f'{request.method} {request.path} ran {counter.count} SQL statements, '
+                f'budget {counter.limit}:\n{statements}\n'
+                f'First statement over budget issued from:\n{counter.offending_stack}'
+            )
+        return response
+
+    @app.teardown_request
+    def _stop_query_count(_error):
+        counter = g.pop('_query_counter', None)
+        if counter is not None:
+            _active_counters.set(tuple(c for c in _active_counters.get() if c is not counter))
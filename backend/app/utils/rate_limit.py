@@ -0,0 +1,227 @@
+"""
+Rate Limiting - Token bucket limits for API routes
+
+Usage:
+    @auth_bp.route('/login', methods=['POST'])
+    @rate_limit('RATELIMIT_LOGIN')          # config key or literal '10/minute'
+    def login_user(): ...
+
+The limit is checked before the view runs, so rejected requests never
+reach the database or password hashing.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from flask import current_app, jsonify, request
+
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*$', re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def parse_limit(value):
+    """
+    Parse a limit such as '10/minute' or '100 per 5 minutes'.
+
+    Returns:
+        tuple: (capacity, refill_rate_per_second)
+    """
+    match = _LIMIT_RE.match(value)
+    if not match:
+        raise ValueError(f'Invalid rate limit: {value!r}')
+
+    count, multiplier, period = match.groups()
+    seconds = _PERIODS[period.lower()] * int(multiplier or 1)
+    return int(count), int(count) / seconds
+
+
+class MemoryBackend:
+    """In-process token buckets (limits apply per worker process)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, cost=1):
+        """
+        Take tokens from a bucket.
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    """Token buckets shared by all workers through Redis"""
+
+    # Refill and consume atomically, using the Redis clock so that every
+    # worker sees the same time
+    SCRIPT = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('The redis package is required for RATELIMIT_STORAGE_URL=redis://...') from e
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, capacity, rate, cost=1):
+        allowed, retry_after = self._script(keys=[key], args=[capacity, rate, cost])
+        return bool(allowed), float(retry_after)
+
+    def reset(self):
+        for key in self._client.scan_iter('rl:*'):
+            self._client.delete(key)
+
+
+def _client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def _token_identity():
+    """
+    Identity from the bearer token, without loading the user.
+
+    Falls back to the client IP for anonymous or invalid tokens.
+    """
+    from flask_jwt_extended import decode_token
+
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            return f"user:{decode_token(header[7:])['sub']}"
+        except Exception:
+            pass
+    return f'ip:{_client_ip()}'
+
+
+_SCOPES = {
+    'ip': lambda: f'ip:{_client_ip()}',
+    'user': _token_identity,
+    'route': lambda: 'all',
+}
+
+
+class RateLimiter:
+    """
+    Rate limiting extension.
+
+    Storage is selected by RATELIMIT_STORAGE_URL: 'memory://' keeps buckets
+    in each worker, 'redis://...' shares them across workers and hosts.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', 'memory://')
+        app.extensions['rate_limiter'] = self._create_backend(app.config['RATELIMIT_STORAGE_URL'])
+
+    @staticmethod
+    def _create_backend(url):
+        if url.startswith('memory://'):
+            return MemoryBackend()
+        if url.startswith(('redis://', 'rediss://', 'unix://')):
+            return RedisBackend(url)
+        raise ValueError(f'Unsupported RATELIMIT_STORAGE_URL: {url}')
+
+    @property
+    def backend(self):
+        return current_app.extensions['rate_limiter']
+
+    def limit(self, limit_value, scope='ip', cost=1):
+        """
+        Decorator applying a token bucket limit to a route.
+
+        Args:
+            limit_value: Config key holding the limit, or a literal such as '5/minute'
+            scope: 'ip', 'user' (token subject, IP for anonymous), 'route'
+                   (shared by all clients) or a callable returning a key
+            cost: Tokens taken per request
+        """
+        key_func = scope if callable(scope) else _SCOPES[scope]
+
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not current_app.config.get('RATELIMIT_ENABLED', True):
+                    return fn(*args, **kwargs)
+
+                capacity, rate = parse_limit(current_app.config.get(limit_value, limit_value))
+                key = f'rl:{request.endpoint}:{key_func()}'
+
+                try:
+                    allowed, retry_after = self.backend.consume(key, capacity, rate, cost)
+                except Exception as e:
+                    # A storage outage should not take the API down with it
+                    current_app.logger.warning(f'Rate limiter unavailable: {e}')
+                    return fn(*args, **kwargs)
+
+                if not allowed:
+                    response = jsonify({
+                        'error': 'Too many requests',
+                        'retry_after': round(retry_after, 1)
+                    })
+                    response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                    return response, 429
+
+                return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+limiter = RateLimiter()
+rate_limit = limiter.limit
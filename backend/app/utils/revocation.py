@@ -0,0 +1,98 @@
+"""
+Token Revocation - Compact in-memory revocation list for access tokens
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+
+def _timestamp(value):
+    """UTC epoch seconds of a naive UTC datetime"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class RevocationList:
+    """
+    Per-process view of the token_revocations table.
+
+    Holds one (token_version, revoked_at) entry per revoked user and is
+    refreshed incrementally from the database at most every
+    TOKEN_REVOCATION_REFRESH seconds, so checking a token normally costs
+    no query. Revocations made by this process apply immediately.
+    """
+
+    # Overlap between incremental refreshes, covering rows committed late
+    # by other workers
+    REFRESH_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self):
+        self._entries = {}
+        self._since = None
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jwt_data):
+        """Check a decoded token against the revocation list"""
+        self._maybe_refresh()
+
+        entry = self._entries.get(int(jwt_data['sub']))
+        if entry is None:
+            return False
+
+        token_version, revoked_at = entry
+        return jwt_data.get('ver', 0) < token_version and jwt_data.get('iat', 0) <= revoked_at
+
+    def record(self, user_id, token_version, revoked_at):
+        """Apply a revocation made by this process without waiting for a refresh"""
+        with self._lock:
+            self._entries[int(user_id)] = (token_version, _timestamp(revoked_at))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._since = None
+            self._next_refresh = 0
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            self._next_refresh = now + current_app.config.get('TOKEN_REVOCATION_REFRESH', 30)
+            try:
+                self._refresh()
+            except Exception as e:
+                # Keep serving the last known list; the next interval retries.
+                # Roll back so the request's transaction is usable again
+                # (PostgreSQL aborts it on any error).
+                from ..extensions import db
+                db.session.rollback()
+                current_app.logger.warning(f'Token revocation refresh failed: {e}')
+
+    def _refresh(self):
+        from ..models import TokenRevocation
+
+        # Entries older than the token lifetime can only match expired tokens
+        lifetime = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES') or timedelta(days=1)
+        horizon = datetime.utcnow() - lifetime
+        since = max(horizon, self._since - self.REFRESH_OVERLAP) if self._since else horizon
+
+        rows = TokenRevocation.query.with_entities(
+            TokenRevocation.user_id, TokenRevocation.token_version, TokenRevocation.revoked_at
+        ).filter(TokenRevocation.revoked_at >= since).all()
+
+        cutoff = _timestamp(horizon)
+        self._entries = {
+            user_id: entry for user_id, entry in self._entries.items() if entry[1] >= cutoff
+        }
+        for user_id, token_version, revoked_at in rows:
+            self._entries[user_id] = (token_version, _timestamp(revoked_at))
+            self._since = max(self._since, revoked_at) if self._since else revoked_at
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,175 @@
+"""
+Thumbnails - On-demand resized copies of uploads with a bounded disk cache
+"""
+import os
+import threading
+import time
+
+from flask import current_app
+from werkzeug.security import safe_join
+
+
+THUMBNAIL_FOLDER = '.thumbs'  # Inside UPLOAD_FOLDER, so thumbnails are served like uploads
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller runs the function; callers arriving while it runs
+    wait for it and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event()}
+
+        if not leader:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class ThumbnailCache:
+    """
+    Disk cache of generated thumbnails with a total size cap.
+
+    File modification times record recency: hits touch the file (at most
+    once per TOUCH_INTERVAL) and eviction removes the least recently used
+    files until the cache is back under 90% of THUMBNAIL_CACHE_MAX_BYTES.
+    The running size is tracked per process and re-measured on every
+    eviction, so several workers sharing the directory stay close to the cap.
+    """
+
+    TOUCH_INTERVAL = 60 * 60
+
+    def __init__(self):
+        self._flight = SingleFlight()
+        self._size = None
+        self._lock = threading.Lock()
+
+    def is_allowed(self, width, height):
+        """Only sizes listed in THUMBNAIL_SIZES are generated"""
+        return (width, height) in {tuple(size) for size in current_app.config.get('THUMBNAIL_SIZES', ())}
+
+    def get(self, filename, width, height):
+        """
+        Path of the thumbnail for an upload, generating it if needed.
+
+        Returns:
+            str: Path relative to UPLOAD_FOLDER, or None if the source is
+            missing or not an image
+
+        Raises:
+            PIL.UnidentifiedImageError: The source cannot be decoded
+            ImageTooLarge: The source exceeds IMAGE_MAX_PIXELS
+        """
+        from .images import DEFAULT_MAX_PIXELS, PIL_FORMATS, render_thumbnail
+
+        # Only originals: no traversal, no thumbnails of raw or cached files
+        if any(part.startswith('.') for part in filename.split('/')):
+            return None
+        # Nor of manifests or other non-image files
+        if os.path.splitext(filename)[1][1:].lower() not in PIL_FORMATS:
+            return None
+
+        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+        relative_path = os.path.join(THUMBNAIL_FOLDER, f'{width}x{height}', filename)
+        path = os.path.join(upload_folder, relative_path)
+        if os.path.isfile(path):
+            self._touch(path)
+            return relative_path
+
+        source_path = safe_join(upload_folder, filename)
+        if source_path is None or not os.path.isfile(source_path):
+            return None
+
+        max_pixels = current_app.config.get('IMAGE_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+
+        def generate():
+            if not os.path.isfile(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                render_thumbnail(source_path, path, width, height, max_pixels)
+                self._added(upload_folder, path)
+
+        self._flight.do(path, generate)
+        return relative_path
+
+    def remove(self, filename):
+        """Drop every cached thumbnail of an upload"""
+        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+        for width, height in current_app.config.get('THUMBNAIL_SIZES', ()):
+            path = os.path.join(upload_folder, THUMBNAIL_FOLDER, f'{width}x{height}', filename)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _touch(self, path):
+        try:
+            if os.path.getmtime(path) < time.time() - self.TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _added(self, upload_folder, path):
+        max_bytes = current_app.config.get('THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        cache_dir = os.path.join(upload_folder, THUMBNAIL_FOLDER)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in _scan(cache_dir))
+            else:
+                self._size += os.path.getsize(path)
+            if self._size > max_bytes:
+                self._size = _evict(cache_dir, int(max_bytes * 0.9), keep=path)
+
+
+def _scan(cache_dir):
+    """Yield (mtime, path, size) for every cached thumbnail"""
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield stat.st_mtime, path, stat.st_size
+
+
+def _evict(cache_dir, target_bytes, keep=None):
+    """Delete least recently used thumbnails until under target_bytes; returns the new size"""
+    entries = sorted(_scan(cache_dir))
+    total = sum(size for _, _, size in entries)
+    for _, path, size in entries:
+        if total <= target_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,135 @@
+"""
+Upload Garbage Collection - Find and remove files no post references
+"""
+import os
+import re
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .file_upload import UPLOAD_REF_PATTERN, HASHED_FILENAME_PATTERN, DIGEST_LENGTH
+from .thumbnails import THUMBNAIL_FOLDER
+
+
+# Any /uploads/ path in featured_image or content, for non-hashed legacy files
+UPLOAD_PATH_PATTERN = re.compile(r'/uploads/([^"\'\s)?#<>]+)')
+THUMBNAIL_PREFIX = re.compile(r'%s/\d+x\d+/' % re.escape(THUMBNAIL_FOLDER))
+
+
+def referenced_uploads(batch_size=500):
+    """
+    Build the set of uploads referenced by any post.
+
+    Streams featured_image and content in batches rather than loading
+    Post objects.
+
+    Returns:
+        tuple: (set of content digests, set of relative paths)
+    """
+    from ..extensions import db
+    from ..models import Post
+
+    digests, paths = set(), set()
+    rows = db.session.query(Post.featured_image, Post.content).execution_options(
+        yield_per=batch_size
+    )
+    for featured_image, content in rows:
+        for text in (featured_image, content):
+            if text:
+                digests.update(UPLOAD_REF_PATTERN.findall(text))
+                paths.update(UPLOAD_PATH_PATTERN.findall(text))
+    return digests, paths
+
+
+def _upload_key(relative_path):
+    """
+    What a file under UPLOAD_FOLDER belongs to: a digest for hashed files
+    (covering variants, manifests, raw and cached copies) or its own path.
+    """
+    relative_path = THUMBNAIL_PREFIX.sub('', relative_path, count=1)
+    match = HASHED_FILENAME_PATTERN.fullmatch(os.path.basename(relative_path))
+    if match:
+        return match.group(1)[:DIGEST_LENGTH], None
+    return None, relative_path
+
+
+def find_orphans(grace_seconds, digests, paths):
+    """
+    Yield (path, relative_path, size) of unreferenced files under
+    UPLOAD_FOLDER last modified more than grace_seconds ago.
+    """
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    cutoff = time.time() - grace_seconds
+
+    for root, _, files in os.walk(upload_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, upload_folder).replace(os.sep, '/')
+            digest, key_path = _upload_key(relative_path)
+            if digest in digests or key_path in paths:
+                continue
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.st_mtime < cutoff:
+                yield path, relative_path, stat.st_size
+
+
+def collect_uploads(grace_seconds, dry_run=False, quarantine_dir=None):
+    """
+    Delete (or move to quarantine_dir) orphaned uploads.
+
+    Files younger than the grace period are kept, covering uploads not yet
+    saved into a post, and so are uploads whose Upload row was refreshed
+    within it: re-uploading stored content does not touch its files. Upload
+    rows whose files are collected are removed as well.
+
+    Returns:
+        dict: Report with files, bytes and the affected relative paths
+    """
+    from ..extensions import db
+    from ..models import Upload
+    from .db import write_transaction
+
+    digests, paths = referenced_uploads()
+    recently_uploaded = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    digests.update(digest for digest, in db.session.query(Upload.digest).filter(
+        Upload.last_uploaded_at >= recently_uploaded
+    ))
+    report = {'files': 0, 'bytes': 0, 'paths': []}
+    collected_digests = set()
+
+    for path, relative_path, size in find_orphans(grace_seconds, digests, paths):
+        report['files'] += 1
+        report['bytes'] += size
+        report['paths'].append(relative_path)
+        if dry_run:
+            continue
+
+        try:
+            if quarantine_dir:
+                target = os.path.join(quarantine_dir, relative_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                os.remove(path)
+        except OSError as e:
+            current_app.logger.warning(f'Could not collect {relative_path}: {e}')
+            continue
+
+        digest, _ = _upload_key(relative_path)
+        if digest:
+            collected_digests.add(digest)
+
+    if collected_digests:
+        with write_transaction():
+            Upload.query.filter(
+                Upload.digest.in_(collected_digests), Upload.ref_count <= 0
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+    return report
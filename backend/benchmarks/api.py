@@ -0,0 +1,431 @@
+"""
+API Benchmark - Latency percentiles and throughput of the main endpoints on a seeded database
+
+Seeds (or reuses) a database of the requested size, then drives each scenario through the
+Flask test client and through a threaded WSGI server with concurrent clients:
+    python benchmarks/api.py --posts 10000
+    python benchmarks/api.py --posts 100000 --mode server --concurrency 16 --json bench.json
+    python benchmarks/api.py --posts 100000 --json new.json --compare bench.json
+    python benchmarks/api.py --posts 100000 --url http://127.0.0.1:8000  # e.g. gunicorn
+
+The default SQLite database is kept in benchmarks/.data and reused while the dataset
+arguments match. Write scenarios add rows, so use --reseed for strictly equal runs.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import dataset  # noqa: E402
+from app.utils.datagen import WORDS, zipf_weights  # noqa: E402
+
+DATA_DIR = os.path.join(BACKEND_DIR, 'benchmarks', '.data')
+
+
+# ---- App and dataset ---- #
+
+def make_config(database_url):
+    """Production settings on the benchmark database, without rate limits"""
+    from app.config import ProductionConfig, build_engine_options
+
+    class BenchmarkConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(database_url)
+        SQLALCHEMY_BINDS = {}
+        DATABASE_REPLICA_BINDS = []
+        RATELIMIT_ENABLED = False
+        IMAGE_PROCESSING_WORKERS = 0
+        QUERY_BUDGETS_ENABLED = False
+        SITE_URL = 'http://localhost'
+
+    return BenchmarkConfig
+
+
+def prepare_database(app, args):
+    """
+    Seed the database unless it already holds this dataset.
+
+    Returns:
+        dict: Dataset description for the report
+    """
+    from app.extensions import db
+
+    size = dataset.dataset_size(args.posts, args.users, args.tags, args.comments_per_post)
+    wanted = {**size, 'seed': args.seed}
+    meta_path = _meta_path(args.database_url)
+
+    with app.app_context():
+        if not args.reseed and meta_path and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                existing = json.load(f)
+            if {key: existing.get(key) for key in wanted} == wanted:
+                print(f'Reusing dataset in {args.database_url}')
+                return existing
+
+        print(f'Seeding {args.database_url}')
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        generated = dataset.seed(db, args.posts, args.users, args.tags, args.comments_per_post,
+                                 seed=args.seed, workers=args.workers, progress=_print_progress)
+        generated['seed_seconds'] = round(time.perf_counter() - started, 1)
+
+    if meta_path:
+        with open(meta_path, 'w') as f:
+            json.dump(generated, f, indent=2)
+    return generated
+
+
+def _print_progress(totals, done, total):
+    if done == total or done % max(1, total // 10) == 0:
+        print(f"  {done}/{total} chunks: {', '.join(f'{n} {table}' for table, n in totals.items() if n)}")
+
+
+def _meta_path(database_url):
+    if database_url.startswith('sqlite:///'):
+        return database_url[len('sqlite:///'):] + '.json'
+    return None
+
+
+def sample_targets(app, rng, count=1000):
+    """Slugs, post ids and tags requested by the scenarios, sampled once up front"""
+    from app.extensions import db
+    from app.models import Post, Tag
+
+    with app.app_context():
+        total = db.session.query(db.func.max(Post.id)).scalar() or 0
+        ids = [rng.randint(1, total) for _ in range(count)] if total else []
+        posts = db.session.query(Post.id, Post.slug).filter(
+            Post.id.in_(ids), Post.status == 'published'
+        ).all()
+        tags = [slug for (slug,) in db.session.query(Tag.slug).order_by(Tag.id)]
+
+    return {
+        'post_ids': [post_id for post_id, _ in posts],
+        'slugs': [slug for _, slug in posts],
+        'tags': tags,
+        # Seeded tag ids are Zipf ranks: popular tag pages are requested more
+        'tag_weights': zipf_weights(len(tags)),
+    }
+
+
+# ---- Scenarios ---- #
+# Each returns (method, path, json body, needs auth)
+
+def _post_list(targets, rng):
+    return 'GET', f'/api/posts?page={rng.randint(1, 50)}', None, False
+
+
+def _post_by_slug(targets, rng):
+    return 'GET', f"/api/posts/{rng.choice(targets['slugs'])}", None, False
+
+
+def _tag_page(targets, rng):
+    tag = rng.choices(targets['tags'], targets['tag_weights'])[0]
+    return 'GET', f'/api/posts/tags/{tag}?page={rng.randint(1, 3)}', None, False
+
+
+def _comments(targets, rng):
+    return 'GET', f"/api/posts/{rng.choice(targets['post_ids'])}/comments", None, False
+
+
+def _rss(targets, rng):
+    return 'GET', '/api/rss', None, False
+
+
+def _login(targets, rng):
+    return 'POST', '/api/auth/login', {'email': dataset.BENCH_EMAIL, 'password': dataset.BENCH_PASSWORD}, False
+
+
+def _create_post(targets, rng):
+    body = {
+        'title': f'Benchmark post {uuid.uuid4().hex[:12]}',
+        'content': '<p>' + ' '.join(rng.choices(WORDS, k=200)) + '</p>',
+        'tags': rng.sample(targets['tags'][:20], 2),
+        'status': 'published',
+    }
+    return 'POST', '/api/user/posts', body, True
+
+
+def _create_comment(targets, rng):
+    body = {
+        'guest_name': 'Benchmark',
+        'guest_email': 'benchmark@example.com',
+        'content': f'{uuid.uuid4().hex} ' + ' '.join(rng.choices(WORDS, k=20)),
+    }
+    return 'POST', f"/api/posts/{rng.choice(targets['post_ids'])}/comments", body, False
+
+
+SCENARIOS = {
+    'post_list': _post_list,
+    'post_by_slug': _post_by_slug,
+    'tag_page': _tag_page,
+    'comments': _comments,
+    'rss': _rss,
+    'login': _login,
+    'create_post': _create_post,
+    'create_comment': _create_comment,
+}
+
+
+# ---- Drivers ---- #
+
+class TestClientDriver:
+    """In-process requests through the Flask test client: no network or server overhead"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HTTPDriver:
+    """Requests over a keep-alive HTTP connection per client thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return self._local.connection
+
+    def request(self, method, path, body, headers):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        connection = self._connection()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def serve(database_url, port):
+    """Run the app on a threaded Werkzeug server with HTTP/1.1 keep-alive (the --serve child)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import create_app
+
+    # Exit normally on terminate() so the app's worker pools shut down too
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    WSGIRequestHandler.log_request = lambda *args, **kwargs: None
+    app = create_app(make_config(database_url))
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def start_server(database_url, port):
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                                '--database-url', database_url, '--port', str(port)])
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('Benchmark server did not start')
+
+
+def login(driver):
+    status, body = driver.request('POST', '/api/auth/login',
+                                  {'email': dataset.BENCH_EMAIL, 'password': dataset.BENCH_PASSWORD}, None)
+    if status != 200:
+        raise RuntimeError(f'Benchmark login failed ({status}): {body[:200]!r}')
+    return {'Authorization': f"Bearer {json.loads(body)['access_token']}"}
+
+
+# ---- Measurement ---- #
+
+def run_scenario(driver, scenario, targets, auth_headers, requests, concurrency, warmup, seed):
+    """
+    Run one scenario: warmup requests, then `requests` timed ones spread
+    over `concurrency` client threads.
+    """
+    def worker(worker_id, count, record):
+        rng = random.Random(f'{seed}-{scenario.__name__}-{worker_id}-{record}')
+        latencies, errors = [], 0
+        for _ in range(count):
+            method, path, body, needs_auth = scenario(targets, rng)
+            start = time.perf_counter()
+            try:
+                status, _ = driver.request(method, path, body, auth_headers if needs_auth else None)
+            except (OSError, http.client.HTTPException):
+                status = None
+            latencies.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                errors += 1
+        return latencies, errors
+
+    shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda i: worker(i, max(1, warmup // concurrency), False), range(concurrency)))
+        started = time.perf_counter()
+        results = list(pool.map(lambda i: worker(i, shares[i], True), range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    return summarize(latencies, sum(errors for _, errors in results), elapsed)
+
+
+def summarize(latencies, errors, elapsed):
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(cuts[49] * 1000, 2),
+        'p95_ms': round(cuts[94] * 1000, 2),
+        'p99_ms': round(cuts[98] * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def compare(report, baseline, threshold):
+    """
+    Print p95 and throughput changes against a previous report.
+
+    Returns:
+        int: Number of scenarios whose p95 grew by more than threshold
+    """
+    regressions = 0
+    for mode, results in report['results'].items():
+        for name, result in results.items():
+            previous = baseline.get('results', {}).get(mode, {}).get(name)
+            if not previous or not previous.get('p95_ms'):
+                continue
+            change = result['p95_ms'] / previous['p95_ms'] - 1
+            throughput = ''
+            if previous.get('throughput_rps') and result.get('throughput_rps'):
+                throughput = f"  throughput {result['throughput_rps'] / previous['throughput_rps'] - 1:+.0%}"
+            flag = 'REGRESSION' if change > threshold else ''
+            regressions += bool(flag)
+            print(f"{mode:<7} {name:<15} p95 {previous['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms "
+                  f"({change:+.0%}){throughput}  {flag}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--posts', type=int, default=10_000, help='Dataset size (e.g. 10000, 100000, 1000000)')
+    parser.add_argument('--users', type=int, help='Default: posts / 20')
+    parser.add_argument('--tags', type=int, help='Default: sqrt(posts)')
+    parser.add_argument('--comments-per-post', type=float, default=5.0, help='Mean of a long-tailed distribution')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='Default: a SQLite file in benchmarks/.data per dataset size')
+    parser.add_argument('--reseed', action='store_true', help='Recreate the dataset even if it matches')
+    parser.add_argument('--workers', type=int, help='Data generation processes (default CPU count)')
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='both')
+    parser.add_argument('--url', help='Benchmark an already running server instead of starting one')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated subset')
+    parser.add_argument('--requests', type=int, default=500, help='Timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads against the server')
+    parser.add_argument('--json', dest='json_path', help='Write the report to this file')
+    parser.add_argument('--compare', help='Previous report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p95 growth counted as a regression by --compare (0.2 = 20%%)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.database_url, args.port)
+        return
+
+    if not args.database_url:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        args.database_url = f"sqlite:///{os.path.join(DATA_DIR, f'posts-{args.posts}.db')}"
+
+    from app import create_app
+    app = create_app(make_config(args.database_url))
+    description = prepare_database(app, args)
+    targets = sample_targets(app, random.Random(args.seed))
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+
+    modes = ['client', 'server'] if args.mode == 'both' else [args.mode]
+    report = {
+        'benchmark': 'api',
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': args.database_url.split(':', 1)[0],
+        'dataset': description,
+        'settings': {'requests': args.requests, 'warmup': args.warmup, 'concurrency': args.concurrency},
+        'results': {},
+    }
+
+    for mode in modes:
+        server = None
+        if mode == 'client':
+            driver, concurrency = TestClientDriver(app), 1
+        else:
+            if not args.url:
+                server = start_server(args.database_url, args.port)
+            driver, concurrency = HTTPDriver(args.url or f'http://127.0.0.1:{args.port}'), args.concurrency
+
+        try:
+            auth_headers = login(driver)
+            results = report['results'][mode] = {}
+            for name in scenarios:
+                results[name] = run_scenario(driver, SCENARIOS[name], targets, auth_headers,
+                                             args.requests, concurrency, args.warmup, args.seed)
+                r = results[name]
+                print(f"{mode:<7} {name:<15} p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+                      f"p99 {r['p99_ms']:>8.2f} ms  {r['throughput_rps']:>8.1f} req/s  errors {r['errors']}")
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(f'{regressions} scenario(s) regressed beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark Dataset - Deterministic synthetic blog data of a configurable size
+
+A thin layer over app.utils.datagen (also behind `flask generate-data`):
+the same arguments always produce the same rows, so results from
+different runs and releases are comparable. User 1 is the admin the
+benchmark logs in as.
+"""
+from app.utils.datagen import dataset_spec, generate_data
+
+# Credentials of the user the benchmark logs in as
+BENCH_EMAIL = 'bench@example.com'
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def dataset_size(posts, users=None, tags=None, comments_per_post=5.0):
+    """Fill in the defaults derived from the post count"""
+    spec = dataset_spec(posts, users, tags, comments_per_post)
+    return {key: spec[key] for key in ('posts', 'users', 'tags', 'comments_per_post')}
+
+
+def seed(db, posts, users=None, tags=None, comments_per_post=5.0, seed=42, workers=None, progress=None):
+    """
+    Generate the dataset into empty tables.
+
+    Returns:
+        dict: The dataset size actually generated, plus row counts
+    """
+    from werkzeug.security import generate_password_hash
+    from app.utils.passwords import password_hasher
+
+    spec = dataset_spec(posts, users, tags, comments_per_post, seed,
+                        admin_email=BENCH_EMAIL, admin_username='bench')
+    # One real hash for the benchmark user, a cheap shared one for the rest
+    password_hashes = (password_hasher.hash(BENCH_PASSWORD),
+                       generate_password_hash(BENCH_PASSWORD, 'pbkdf2:sha256:1000'))
+    totals = generate_data(db.engine, db.metadata, spec, password_hashes, workers, progress)
+
+    return {
+        **dataset_size(posts, users, tags, comments_per_post),
+        'seed': seed,
+        'post_tags': totals['post_tags'],
+        'comments': totals['comments'],
+    }
@@ -0,0 +1,93 @@
+"""
+Startup Benchmark - Import and app factory time in fresh interpreters
+
+Each run starts a new Python process, so nothing is cached between runs:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --config app.config.ProductionConfig --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child process; prints one JSON line of timings in ms
+PROBE = """
+import importlib, json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+module, _, name = {config!r}.rpartition('.')
+create_app(getattr(importlib.import_module(module), name))
+created = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'factory_ms': (created - imported) * 1000,
+    'total_ms': (created - start) * 1000,
+}}))
+"""
+
+
+def run_once(config):
+    """Time one cold start in a child interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(config=config)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def interpreter_baseline(runs):
+    """Median time of an empty interpreter start, for reference"""
+    import time
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def summarize(samples):
+    return {
+        key: {
+            'median': round(statistics.median(s[key] for s in samples), 1),
+            'min': round(min(s[key] for s in samples), 1),
+            'max': round(max(s[key] for s in samples), 1),
+        }
+        for key in ('import_ms', 'factory_ms', 'total_ms')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='app.config.ProductionConfig',
+                        help='Dotted path of the config class passed to create_app')
+    parser.add_argument('--json', dest='json_path', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    run_once(args.config)  # Warm the filesystem and bytecode caches
+    samples = [run_once(args.config) for _ in range(args.runs)]
+    report = {
+        'config': args.config,
+        'runs': args.runs,
+        'interpreter_ms': round(interpreter_baseline(args.runs), 1),
+        **summarize(samples),
+    }
+
+    for key in ('import_ms', 'factory_ms', 'total_ms'):
+        stats = report[key]
+        print(f"{key:<12} median {stats['median']:>7.1f}  min {stats['min']:>7.1f}  max {stats['max']:>7.1f}")
+    print(f"{'interpreter':<12} median {report['interpreter_ms']:>7.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Add comment_fingerprints for duplicate comment detection
+
+Revision ID: 1538764e1993
+Revises: aa63a98f9d04
+Create Date: 2026-10-19 11:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1538764e1993'
+down_revision = 'aa63a98f9d04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('comment_fingerprints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('comment_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=80), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['comment_id'], ['comments.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('comment_fingerprints', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_comment_fingerprints_comment_id'), ['comment_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comment_fingerprints_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_comment_fingerprints_key'), ['key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment_fingerprints', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comment_fingerprints_key'))
+        batch_op.drop_index(batch_op.f('ix_comment_fingerprints_created_at'))
+        batch_op.drop_index(batch_op.f('ix_comment_fingerprints_comment_id'))
+
+    op.drop_table('comment_fingerprints')
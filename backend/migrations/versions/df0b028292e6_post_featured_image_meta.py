@@ -0,0 +1,26 @@
+"""Add posts.featured_image_meta for responsive image variants
+
+Revision ID: df0b028292e6
+Revises: 1445d37b817e
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'df0b028292e6'
+down_revision = '1445d37b817e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('featured_image_meta', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('featured_image_meta')
@@ -2,8 +2,9 @@
 Blog Platform Backend - Entry Point
 """
 from app import create_app
+from app.config import config_from_env
 
-app = create_app()
+app = create_app(config_from_env())
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,55 @@
+"""
+Test Fixtures - An app over a seeded SQLite database
+
+The dataset comes from app.utils.datagen (as `flask generate-data` and
+the benchmarks), so query budgets are checked against full pages.
+"""
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.utils.datagen import dataset_spec, generate_data
+
+pytest_plugins = ['app.testing']
+
+ADMIN_EMAIL = 'admin@example.com'
+USER_EMAIL = 'user2@example.com'
+PASSWORD = 'test-password'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """App over a 200-post database; user 1 is the admin, user 2 a regular user"""
+    database = tmp_path_factory.mktemp('db') / 'blog.db'
+
+    class SeededConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database}'
+        UPLOAD_FOLDER = str(tmp_path_factory.mktemp('uploads'))
+        AUTO_CREATE_TABLES = False
+
+    app = create_app(SeededConfig)
+    with app.app_context():
+        from app.utils.passwords import password_hasher
+
+        db.create_all()
+        password_hash = password_hasher.hash(PASSWORD)
+        spec = dataset_spec(200, admin_email=ADMIN_EMAIL, admin_username='admin')
+        generate_data(db.engine, db.metadata, spec, (password_hash, password_hash), workers=0)
+    return app
+
+
+def _login(app, path, email):
+    response = app.test_client().post(path, json={'email': email, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.fixture(scope='session')
+def admin_headers(app):
+    return _login(app, '/api/auth/admin/login', ADMIN_EMAIL)
+
+
+@pytest.fixture(scope='session')
+def user_headers(app):
+    return _login(app, '/api/auth/login', USER_EMAIL)
@@ -0,0 +1,61 @@
+"""
+Bulk user provisioning: per-row reports, also when hashing runs out of capacity
+"""
+import json
+
+from app.utils import PasswordHasherBusy, password_hasher
+
+
+def ndjson(*records):
+    return '\n'.join(json.dumps(record) for record in records)
+
+
+def bulk(client, headers, body):
+    return client.post('/api/admin/users/bulk?format=ndjson', headers=headers, data=body)
+
+
+def test_invalid_rows_fail_before_hashing(client, admin_headers, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(password_hasher, 'hash_many', lambda passwords: hashed.extend(passwords) or [])
+
+    response = bulk(client, admin_headers, ndjson(
+        {'email': 'not-an-email', 'username': 'bulk-a', 'password': 'long-enough'},
+        {'email': 'bulk-b@example', 'username': 'bulk-b', 'password': 'long-enough'},
+        {'email': 'bulk-c@example.com', 'username': 'bulk-c', 'password': 'short'},
+        {'email': 'bulk-d@example.com', 'username': 'd' * 81, 'password': 'long-enough'},
+    ))
+
+    report = response.get_json()
+    assert response.status_code == 200
+    assert (report['created'], report['failed'], report['not_processed']) == (0, 4, 0)
+    assert [error['error'] for error in report['errors']] == [
+        'Invalid email', 'Invalid email', 'Password must be at least 6 characters',
+        'Username must be at most 80 characters',
+    ]
+    assert hashed == []
+
+
+def test_busy_hasher_stops_with_a_partial_report(app, client, admin_headers, monkeypatch):
+    monkeypatch.setitem(app.config, 'BULK_IMPORT_CHUNK_SIZE', 2)
+    hash_many = password_hasher.hash_many
+    calls = []
+
+    def busy_after_first_chunk(passwords):
+        calls.append(1)
+        if len(calls) > 1:
+            raise PasswordHasherBusy('no free worker')
+        return hash_many(passwords)
+
+    monkeypatch.setattr(password_hasher, 'hash_many', busy_after_first_chunk)
+    records = [{'email': f'busy{n}@example.com', 'username': f'busy{n}', 'password': 'long-enough'}
+               for n in range(1, 6)]
+    records[2]['email'] = 'invalid'
+
+    response = bulk(client, admin_headers, ndjson(*records))
+
+    report = response.get_json()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert (report['created'], report['failed'], report['not_processed']) == (2, 1, 2)
+    assert report['errors'] == [{'row': 3, 'error': 'Invalid email'}]
+    assert report['resume_from_row'] == 3
@@ -0,0 +1,35 @@
+"""
+/api/metrics access: a bearer token when METRICS_TOKEN is set, loopback otherwise
+"""
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+
+REMOTE = {'REMOTE_ADDR': '203.0.113.7'}
+
+
+def metrics_client(tmp_path, token=''):
+    class MetricsConfig(TestingConfig):
+        METRICS_ENABLED = True
+        METRICS_DIR = str(tmp_path)
+        METRICS_TOKEN = token
+
+    return create_app(MetricsConfig).test_client()
+
+
+@pytest.mark.parametrize('environ, status', [({}, 200), (REMOTE, 404)])
+def test_without_token_only_loopback_may_scrape(tmp_path, environ, status):
+    assert metrics_client(tmp_path).get('/api/metrics', environ_base=environ).status_code == status
+
+
+@pytest.mark.parametrize('authorization, status', [
+    (None, 404),
+    ('Bearer wrong', 404),
+    ('Bearer s3cret', 200),
+])
+def test_token_is_required_from_any_address(tmp_path, authorization, status):
+    headers = {'Authorization': authorization} if authorization else {}
+    client = metrics_client(tmp_path, token='s3cret')
+    assert client.get('/api/metrics', headers=headers).status_code == status
+    assert client.get('/api/metrics', headers=headers, environ_base=REMOTE).status_code == status
@@ -0,0 +1,59 @@
+"""
+Query budgets of the GET routes, checked on the seeded database
+"""
+import pytest
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Comment, Post
+
+# (path, who) per budgeted route; {post_id}, {slug} and {own_post_id} come from the dataset
+BUDGETED_REQUESTS = [
+    ('/api/posts?per_page=50', None),
+    ('/api/posts/{slug}', None),
+    ('/api/posts/tags', None),
+    ('/api/posts/tags/tag-1?per_page=50', None),
+    ('/api/posts/{post_id}/comments', None),
+    ('/api/rss', None),
+    ('/api/rss/tags/tag-1', None),
+    ('/api/rss/authors/user2', None),
+    ('/api/rss/info', None),
+    ('/api/comments/my', 'user'),
+    ('/api/user/dashboard', 'user'),
+    ('/api/user/posts?per_page=50', 'user'),
+    ('/api/user/posts/{own_post_id}', 'user'),
+    ('/api/user/comments', 'user'),
+    ('/api/admin/dashboard', 'admin'),
+    ('/api/admin/posts?per_page=50', 'admin'),
+    ('/api/admin/posts/{post_id}', 'admin'),
+    ('/api/admin/comments', 'admin'),
+    ('/api/admin/users', 'admin'),
+]
+
+
+@pytest.fixture(scope='module')
+def dataset(app):
+    """URL values pointing at well-populated rows of the seeded database"""
+    with app.app_context():
+        post_id, slug = db.session.query(Post.id, Post.slug).join(Comment, Comment.post_id == Post.id)\
+            .filter(Post.status == 'published')\
+            .group_by(Post.id).order_by(func.count(Comment.id).desc()).first()
+        own_post_id = db.session.query(Post.id).filter(Post.author_id == 2).limit(1).scalar()
+    assert own_post_id is not None, 'user 2 has no posts in the dataset'
+    return {'post_id': post_id, 'slug': slug, 'own_post_id': own_post_id}
+
+
+@pytest.mark.parametrize('path, who', BUDGETED_REQUESTS)
+def test_route_within_query_budget(path, who, dataset, assert_query_budget, request):
+    headers = request.getfixturevalue(f'{who}_headers') if who else None
+    response = assert_query_budget(path.format(**dataset), headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def test_every_budgeted_route_is_checked(app):
+    adapter = app.url_map.bind('localhost')
+    checked = {adapter.match(path.split('?', 1)[0].format(post_id=1, slug='s', own_post_id=1))[0]
+               for path, _ in BUDGETED_REQUESTS}
+    budgeted = {endpoint for endpoint, view in app.view_functions.items()
+                if getattr(view, 'query_budget', None) is not None}
+    assert budgeted <= checked, f'Routes without a budget test: {sorted(budgeted - checked)}'
@@ -0,0 +1,27 @@
+"""
+Feeds: conditional requests and links independent of the Host header
+"""
+from app.services import rss_service
+
+
+def test_unchanged_feed_answers_304(client):
+    first = client.get('/api/rss?format=atom')
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get('/api/rss?format=atom', headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_feed_links_use_site_url(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'SITE_URL', 'https://blog.example.com/')
+    rss_service.invalidate()
+
+    feeds = [client.get('/api/rss?format=json', headers={'Host': host}).get_json()
+             for host in ('evil.example.net', 'localhost')]
+
+    assert feeds[0] == feeds[1]
+    assert feeds[0]['home_page_url'] == 'https://blog.example.com'
+    assert all(item['url'].startswith('https://blog.example.com/blog/') for item in feeds[0]['items'])
+    rss_service.invalidate()
@@ -0,0 +1,127 @@
+"""
+Content-addressed uploads
+"""
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+
+def image_bytes(color, fmt='JPEG', size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def upload(client, headers, data, filename):
+    response = client.post('/api/user/posts/upload', headers=headers,
+                           data={'image': (io.BytesIO(data), filename)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['image_url']
+
+
+def test_same_bytes_under_other_extensions_share_one_file(client, user_headers):
+    data = image_bytes((200, 30, 30))
+
+    urls = [upload(client, user_headers, data, name) for name in ('photo.jpeg', 'photo.JPG', 'photo.png')]
+
+    assert len(set(urls)) == 1 and urls[0].endswith('.jpg')
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.data[:2] == b'\xff\xd8'
+
+
+# ---- Reference counting ---- #
+
+def create_post(client, headers, **fields):
+    response = client.post('/api/user/posts', headers=headers,
+                           json={'title': 'Shared image', 'content': '<p>Text</p>', **fields})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['post']['id']
+
+
+def stored_files(app, url):
+    """Every file stored for the upload behind url (original, variants, manifest)"""
+    from app.utils import image_references
+
+    digest = image_references(url).pop()
+    folder = app.config['UPLOAD_FOLDER']
+    return [os.path.join(root, name) for root, _, names in os.walk(folder) for name in names if digest in name]
+
+
+def expire_pending(app, url, hours=48):
+    """Age an upload past UPLOAD_PENDING_HOURS and the gc-uploads grace period"""
+    from app.extensions import db
+    from app.models import Upload
+    from app.utils import image_references
+
+    with app.app_context():
+        Upload.query.filter(Upload.digest.in_(image_references(url))).update(
+            {Upload.last_uploaded_at: datetime.utcnow() - timedelta(hours=hours)}
+        )
+        db.session.commit()
+    past = time.time() - hours * 3600
+    for path in stored_files(app, url):
+        os.utime(path, (past, past))
+
+
+def test_image_shared_by_two_posts_outlives_the_first_delete(app, client, user_headers):
+    url = upload(client, user_headers, image_bytes((30, 200, 30)), 'shared.jpg')
+    first = create_post(client, user_headers, featured_image=url)
+    second = create_post(client, user_headers, content=f'<p><img src="{url}"></p>')
+    expire_pending(app, url)
+
+    assert client.delete(f'/api/user/posts/{first}', headers=user_headers).status_code == 200
+    assert stored_files(app, url)
+    assert client.get(url).status_code == 200
+
+    assert client.delete(f'/api/user/posts/{second}', headers=user_headers).status_code == 200
+    assert stored_files(app, url) == []
+
+
+def test_update_releases_inline_images(app, client, user_headers):
+    kept = upload(client, user_headers, image_bytes((30, 30, 200)), 'kept.png')
+    dropped = upload(client, user_headers, image_bytes((200, 200, 30)), 'dropped.png')
+    post_id = create_post(client, user_headers, content=f'<img src="{kept}"><img src="{dropped}">')
+    expire_pending(app, kept)
+    expire_pending(app, dropped)
+
+    response = client.put(f'/api/user/posts/{post_id}', headers=user_headers,
+                          json={'content': f'<p><img src="{kept}"></p>'})
+
+    assert response.status_code == 200, response.get_json()
+    assert stored_files(app, kept)
+    assert stored_files(app, dropped) == []
+
+
+def test_release_keeps_an_image_uploaded_again(app, client, user_headers):
+    data = image_bytes((120, 30, 200))
+    url = upload(client, user_headers, data, 'again.jpg')
+    post_id = create_post(client, user_headers, featured_image=url)
+    expire_pending(app, url)
+
+    assert upload(client, user_headers, data, 'again.jpg') == url
+    assert client.delete(f'/api/user/posts/{post_id}', headers=user_headers).status_code == 200
+
+    assert stored_files(app, url)
+
+
+def test_gc_uploads_keeps_files_with_a_pending_reference(app, client, user_headers):
+    data = image_bytes((200, 120, 30))
+    url = upload(client, user_headers, data, 'pending.jpg')
+    expire_pending(app, url)
+    orphan = upload(client, user_headers, image_bytes((30, 120, 200)), 'orphan.jpg')
+    expire_pending(app, orphan)
+
+    # Re-uploading refreshes the row but not the (old) files
+    assert upload(client, user_headers, data, 'pending.jpg') == url
+    result = app.test_cli_runner().invoke(args=['gc-uploads', '--grace-hours', '1'])
+
+    assert result.exit_code == 0, result.output
+    assert stored_files(app, url)
+    assert client.get(url).status_code == 200
+    assert stored_files(app, orphan) == []
@@ -0,0 +1,41 @@
+"""
+write_transaction: a single writer at a time on SQLite
+"""
+import pytest
+
+from app.extensions import db
+from app.models import Comment, Post
+from app.utils.db import _sqlite_write_lock, write_transaction
+
+
+@pytest.fixture
+def post_id(app):
+    with app.app_context():
+        return db.session.query(Post.id).filter_by(status='published').limit(1).scalar()
+
+
+def test_writer_without_a_slot_gets_503(app, client, user_headers, post_id, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQLITE_BUSY_TIMEOUT_MS', 50)
+    path = f'/api/user/posts/{post_id}/comments'
+
+    with _sqlite_write_lock:
+        response = client.post(path, headers=user_headers, json={'content': 'Blocked'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post(path, headers=user_headers, json={'content': 'Through'}).status_code == 201
+
+
+def test_pending_changes_are_not_committed_by_the_block(app, post_id):
+    @write_transaction()
+    def write():
+        db.session.commit()
+
+    with app.app_context():
+        db.session.add(Comment(post_id=post_id, guest_name='Pending', guest_email='p@example.com',
+                               content='Not mine to commit'))
+        with pytest.raises(RuntimeError):
+            write()
+        db.session.rollback()
+        assert not Comment.query.filter_by(guest_name='Pending').count()
+    assert not _sqlite_write_lock.locked()